@@ -1,127 +1,369 @@
+import atexit
+import contextlib
 import html
 import json
+import logging
 import os
 import re
+import threading
 import time
+from collections.abc import Mapping
 from pathlib import Path
+from types import MappingProxyType
 from typing import TYPE_CHECKING, Any, Optional
 
 from anki.hooks import addHook
-from aqt import mw
-from aqt.qt import (
-    QAction,
-    QComboBox,
-    QDialog,
-    QDialogButtonBox,
-    QFrame,
-    QHBoxLayout,
-    QLabel,
-    QLineEdit,
-    QPushButton,
-    Qt,
-    QTabWidget,
-    QTextEdit,
-    QVBoxLayout,
-    QWidget,
-    QGroupBox,
-)
-from aqt.utils import showInfo
-
-from .ai_client import (
-    DEFAULT_MODEL,
-    generate_content,
-    generate_story_with_words,
-    get_default_prompt_template,
-    get_default_story_prompt_template,
-    list_models,
-)
-from .language_constants import LANGUAGE_NAMES, SUPPORTED_LANGUAGES, get_lang_code
-from .tts_client import download_audio
+from aqt import gui_hooks, mw
+
+# Only what is needed to register the menu actions and dialog classes is imported
+# at load time. Widgets and the API clients are imported where they are used so
+# Anki startup does not pay for them until LexiForge is actually opened.
+from aqt.qt import QAction, QDialog, Qt
+from aqt.utils import showInfo, tooltip
+
+from .language_constants import get_lang_code
+
+# Anki ships orjson, but fall back to the standard library when it is missing
+try:
+    import orjson
+
+    def _json_loads(data: bytes) -> Any:
+        return orjson.loads(data)
+
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+except ImportError:
+
+    def _json_loads(data: bytes) -> Any:
+        return json.loads(data)
+
+    def _json_dumps(obj: Any) -> bytes:
+        text = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+        return text.encode("utf-8")
+
 
 if TYPE_CHECKING:
-    from concurrent.futures import Future
+    from collections.abc import Sequence
+    from concurrent.futures import Future, ThreadPoolExecutor
 
     from anki.notes import Note
+    from aqt.browser import Browser
     from aqt.editor import Editor
+    from aqt.qt import QComboBox, QStringListModel, QVBoxLayout
+
+logger = logging.getLogger(__name__)
 
 # Constants
 ADDON_NAME = "LexiForge"
 ICON_NAME = "lexiforge_icon.svg"
 CONFIG_FILENAME = "config.json"
 _CONFIG_CACHE: Optional[dict[str, Any]] = None
+# st_mtime_ns of config.json when _CONFIG_CACHE was loaded or last written, so
+# edits made outside the add-on are picked up without reparsing on every call
+_CONFIG_MTIME: Optional[int] = None
+# Config writes happen on a background thread; saves arriving while a write is
+# pending are coalesced into a single write of the latest snapshot.
+_CONFIG_DIRTY = threading.Event()
+_CONFIG_WRITE_LOCK = threading.Lock()
+_CONFIG_WRITER: Optional[threading.Thread] = None
+# Bumped by every save so a write only clears _CONFIG_DIRTY if no newer save
+# arrived meanwhile; guarded by _CONFIG_STATE_LOCK together with the flag
+_CONFIG_VERSION = 0
+_CONFIG_STATE_LOCK = threading.Lock()
+# Seconds the background writer waits before retrying a failed write
+CONFIG_RETRY_DELAY = 5.0
+_FIELD_NAMES_CACHE: Optional[tuple[Any, list[str]]] = None
+# Studied words per deck, valid while the (collection, day, latest review) stamp
+# stays the same
+_STUDIED_CACHE: tuple[Any, dict[tuple[Optional[int], Optional[int]], list[str]]] = (
+    None,
+    {},
+)
+# Combo box list models shared between dialogs: name -> (items, model, positions)
+_LIST_MODELS: dict[str, tuple[tuple[str, ...], "QStringListModel", dict[str, int]]] = {}
+
+# Background pool for audio downloads; created on first use
+_AUDIO_EXECUTOR: Optional["ThreadPoolExecutor"] = None
+
+# (note, word) pairs the editor is generating for; only used on the main thread
+_EDITOR_JOBS: set[tuple[int, str]] = set()
+
+# Upper bound on notes fetched for a story; the prompt only uses the first few
+STORY_WORD_LIMIT = 200
+
+# Patterns used to clean note fields and format stories
+# HTML tags and [sound:...] references are stripped in a single pass
+_CLEAN_RE = re.compile(r"<[^>]+>|\[sound:[^\]]+\]")
+# Markdown bold (**text**) and newlines are converted to HTML in a single pass
+_STORY_RE = re.compile(r"\*\*([^*]+)\*\*|\n")
+
+
+def _story_html_repl(match: "re.Match[str]") -> str:
+    """Replacement callback for _STORY_RE.
+
+    Newlines inside a bold span are converted as well, matching the output of
+    converting bold first and newlines afterwards.
+    """
+    bold = match.group(1)
+    if bold is None:
+        return "<br>"
+    return "<b>" + bold.replace("\n", "<br>") + "</b>"
+
+
+# Characters not allowed in audio filenames (\w covers Unicode letters, digits, _)
+_FNAME_RE = re.compile(r"[^\w \-]")
 
 
 def get_config_path() -> str:
     """Get the absolute path to the configuration file."""
-    return os.path.join(os.path.dirname(__file__), CONFIG_FILENAME)
+    return str(Path(__file__).parent / CONFIG_FILENAME)
 
 
-def get_config() -> dict[str, Any]:
+def get_config() -> Mapping[str, Any]:
     """
     Load the configuration from the JSON file.
-    Returns an empty dictionary if the file does not exist.
+    Returns an empty mapping if the file does not exist.
+
+    The result is a read-only view of the cached config; copy it with dict()
+    before making changes to pass to save_config(). The file is only parsed
+    again when its modification time changes.
     """
-    global _CONFIG_CACHE
-    if _CONFIG_CACHE is not None:
-        return _CONFIG_CACHE.copy()
+    global _CONFIG_CACHE, _CONFIG_MTIME
+    # A pending save is newer than whatever is on disk
+    if _CONFIG_CACHE is not None and _CONFIG_DIRTY.is_set():
+        return MappingProxyType(_CONFIG_CACHE)
+
+    config_path = Path(get_config_path())
+    try:
+        mtime: Optional[int] = config_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if _CONFIG_CACHE is not None and mtime == _CONFIG_MTIME:
+        return MappingProxyType(_CONFIG_CACHE)
 
-    config_path = get_config_path()
     data: dict[str, Any] = {}
-    if os.path.exists(config_path):
+    if mtime is not None:
         try:
-            with open(config_path, encoding="utf-8") as f:
-                data = json.load(f)
+            data = _json_loads(config_path.read_bytes())
         except json.JSONDecodeError:
             data = {}
+    template = data.get("prompt_template")
+    if isinstance(template, str) and template:
+        from .ai_client import is_default_prompt_template
+
+        # Older versions saved the default prompt itself; read it as ""
+        if is_default_prompt_template(template):
+            data["prompt_template"] = ""
 
     _CONFIG_CACHE = data
-    return _CONFIG_CACHE.copy()
+    _CONFIG_MTIME = mtime
+    return MappingProxyType(_CONFIG_CACHE)
 
 
-def save_config(config: dict[str, Any]) -> None:
+def save_config(config: Mapping[str, Any]) -> None:
     """
-    Save the configuration to the JSON file.
+    Save the configuration.
+    The in-memory copy is updated immediately; the file is written in the
+    background so the caller (usually the UI thread) never waits on disk.
 
     Args:
         config: The configuration dictionary to save.
     """
-    global _CONFIG_CACHE
-    _CONFIG_CACHE = dict(config)
-    config_path = get_config_path()
-    with open(config_path, "w", encoding="utf-8") as f:
-        json.dump(_CONFIG_CACHE, f, indent=4)
+    global _CONFIG_CACHE, _CONFIG_WRITER, _CONFIG_VERSION
+    with _CONFIG_STATE_LOCK:
+        _CONFIG_CACHE = dict(config)
+        _CONFIG_VERSION += 1
+        _CONFIG_DIRTY.set()
+    if _CONFIG_WRITER is None or not _CONFIG_WRITER.is_alive():
+        _CONFIG_WRITER = threading.Thread(
+            target=_config_writer_loop, name="lexiforge-config", daemon=True
+        )
+        _CONFIG_WRITER.start()
+
+
+def flush_config() -> bool:
+    """
+    Write pending configuration changes to disk, if any.
+
+    Returns:
+        False if the write failed; the changes then stay pending and the
+        background writer tries again after CONFIG_RETRY_DELAY seconds.
+    """
+    global _CONFIG_MTIME
+    with _CONFIG_WRITE_LOCK:
+        with _CONFIG_STATE_LOCK:
+            if not _CONFIG_DIRTY.is_set():
+                return True
+            data, version = _CONFIG_CACHE, _CONFIG_VERSION
+        config_path = Path(get_config_path())
+        tmp_path = config_path.with_suffix(".json.tmp")
+        # Write compact JSON to a temporary file, make sure it reached the disk
+        # and swap it in, so a crash never leaves a truncated config behind.
+        # A readable copy is available from Settings -> Export Config.
+        try:
+            with tmp_path.open("wb") as f:
+                f.write(_json_dumps(data))
+                f.flush()
+                os.fsync(f.fileno())
+            tmp_path.replace(config_path)
+            mtime = config_path.stat().st_mtime_ns
+        except (OSError, TypeError, ValueError):
+            logger.exception(
+                "Could not save %s; the change is kept pending", config_path
+            )
+            with contextlib.suppress(OSError):
+                tmp_path.unlink(missing_ok=True)
+            return False
+        with _CONFIG_STATE_LOCK:
+            # Our own write must not look like an external edit to get_config()
+            _CONFIG_MTIME = mtime
+            if version == _CONFIG_VERSION:
+                _CONFIG_DIRTY.clear()
+        return True
+
+
+def _config_writer_loop() -> None:
+    while True:
+        _CONFIG_DIRTY.wait()
+        if not flush_config():
+            time.sleep(CONFIG_RETRY_DELAY)
+
+
+# Make sure a save made right before Anki quits still reaches the disk
+atexit.register(flush_config)
 
 
 # --- GUI ---
 
+
+def _set_shared_items(
+    combo: "QComboBox",
+    name: str,
+    items: "Sequence[str]",
+    current: Optional[str] = None,
+) -> None:
+    """
+    Show items in combo through a QStringListModel shared by every combo box
+    that displays the same list, instead of inserting the items one by one.
+
+    Args:
+        combo: Combo box to fill.
+        name: Identifies the shared list (e.g. "fields").
+        items: Entries to show; the model is rebuilt only when they change.
+        current: Entry to select, if present.
+    """
+    from aqt.qt import QComboBox, QStringListModel
+
+    items = tuple(items)
+    cached = _LIST_MODELS.get(name)
+    if cached is None or cached[0] != items:
+        cached = (
+            items,
+            QStringListModel(list(items)),
+            {v: i for i, v in enumerate(items)},
+        )
+        _LIST_MODELS[name] = cached
+    _items, model, positions = cached
+
+    # Typed entries must not be appended to a model other combos share
+    combo.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
+    combo.setModel(model)
+    index = positions.get(current) if current is not None else None
+    if index is not None:
+        combo.setCurrentIndex(index)
+
+
 class SettingsDialog(QDialog):
     def __init__(self, parent: Optional[QDialog] = None) -> None:
         super().__init__(parent)
         self.setWindowTitle("LexiForge Settings")
         # Make sure the dialog appears on top
         self.setWindowFlags(self.windowFlags() | Qt.WindowType.WindowStaysOnTopHint)
-        self.config = get_config()
+        self.config = dict(get_config())
         self.all_field_names = self.get_all_field_names()
         self.setup_ui()
 
     def get_all_field_names(self) -> list[str]:
+        """
+        Return the sorted field names of all note types.
+        The result is cached until a note type is added, removed or modified.
+        """
+        global _FIELD_NAMES_CACHE
         if not mw.col:
             return []
-        fields = set()
-        for model in mw.col.models.all():
-            for fld in model["flds"]:
-                fields.add(fld["name"])
-        return sorted(fields)
+
+        try:
+            version = tuple(
+                mw.col.db.first("SELECT COUNT(*), MAX(mtime_secs) FROM notetypes")
+            )
+        except Exception:
+            version = mw.col.mod
+        if _FIELD_NAMES_CACHE is not None and _FIELD_NAMES_CACHE[0] == version:
+            return _FIELD_NAMES_CACHE[1]
+
+        try:
+            # Fields live in their own table since schema 15 (Anki 2.1.28+)
+            names = sorted(mw.col.db.list("SELECT DISTINCT name FROM fields"))
+        except Exception:
+            names = sorted(
+                {fld["name"] for model in mw.col.models.all() for fld in model["flds"]}
+            )
+
+        _FIELD_NAMES_CACHE = (version, names)
+        return names
 
     def setup_ui(self) -> None:
+        from aqt.qt import QDialogButtonBox, QTabWidget, QVBoxLayout, QWidget
+
         main_layout = QVBoxLayout()
 
-        # Create tab widget
-        tabs = QTabWidget()
+        # Create tab widget. Tab contents are built the first time a tab is
+        # shown, so opening the dialog only pays for the visible tab.
+        self.tabs = QTabWidget()
+        self._tab_builders = (self._build_main_tab, self._build_practice_tab)
+        self._built = {0: False, 1: False}
+        for title in ("Main Settings", "Reading Practice"):
+            tab = QWidget()
+            tab.setLayout(QVBoxLayout())
+            self.tabs.addTab(tab, title)
+        self.tabs.currentChanged.connect(self._ensure_built)
+
+        main_layout.addWidget(self.tabs)
+
+        # Buttons
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        main_layout.addWidget(buttons)
+
+        self.setLayout(main_layout)
+        self._ensure_built(0)
+
+    def _ensure_built(self, index: int) -> None:
+        """Populate the tab at ``index`` on its first activation."""
+        if index < 0 or self._built.get(index, True):
+            return
+        self._built[index] = True
+        layout = self.tabs.widget(index).layout()
+        self._tab_builders[index](layout)
+        layout.addStretch()
+
+    def _build_main_tab(self, main_tab_layout: "QVBoxLayout") -> None:
+        from aqt.qt import (
+            QComboBox,
+            QFrame,
+            QHBoxLayout,
+            QLabel,
+            QLineEdit,
+            QPushButton,
+            QTextEdit,
+        )
 
-        # Tab 1: Main Settings
-        main_tab = QWidget()
-        main_tab_layout = QVBoxLayout()
+        from .ai_client import DEFAULT_MODEL, get_default_prompt_template
+        from .language_constants import LANGUAGE_NAMES
 
         # API Key
         main_tab_layout.addWidget(QLabel("Gemini API Key:"))
@@ -147,6 +389,7 @@ class SettingsDialog(QDialog):
         self.model_combo.setCurrentText(current_model)
 
         self.load_models_btn = QPushButton("Load Models")
+        self.load_models_btn.setToolTip("Shift+click to refresh the cached list")
         self.load_models_btn.clicked.connect(self.load_models)
 
         model_layout.addWidget(self.model_combo)
@@ -163,22 +406,23 @@ class SettingsDialog(QDialog):
         main_tab_layout.addWidget(QLabel("Source Language (word language):"))
         self.source_lang_combo = QComboBox()
         # Add "Auto" as first option
-        languages = ["Auto", *LANGUAGE_NAMES]
-        self.source_lang_combo.addItems(languages)
-        current_source = self.config.get("source_lang", "Auto")
-        index = self.source_lang_combo.findText(current_source)
-        if index >= 0:
-            self.source_lang_combo.setCurrentIndex(index)
+        _set_shared_items(
+            self.source_lang_combo,
+            "source_langs",
+            ("Auto", *LANGUAGE_NAMES),
+            self.config.get("source_lang", "Auto"),
+        )
         main_tab_layout.addWidget(self.source_lang_combo)
 
         # Definition Language (language for definitions)
         main_tab_layout.addWidget(QLabel("Definition Language (definitions):"))
         self.def_lang_combo = QComboBox()
-        self.def_lang_combo.addItems(LANGUAGE_NAMES)
-        current_def = self.config.get("definition_lang", "English")
-        index = self.def_lang_combo.findText(current_def)
-        if index >= 0:
-            self.def_lang_combo.setCurrentIndex(index)
+        _set_shared_items(
+            self.def_lang_combo,
+            "definition_langs",
+            LANGUAGE_NAMES,
+            self.config.get("definition_lang", "English"),
+        )
         main_tab_layout.addWidget(self.def_lang_combo)
 
         # Separator
@@ -198,16 +442,29 @@ class SettingsDialog(QDialog):
         current_prompt = self.config.get("prompt_template", "") or default_prompt
         self.prompt_editor.setPlainText(current_prompt)
         main_tab_layout.addWidget(self.prompt_editor)
+        prompt_hint = QLabel(
+            "The answer format is added automatically. An edited prompt is sent "
+            "one word per request, also from the Browser."
+        )
+        prompt_hint.setWordWrap(True)
+        main_tab_layout.addWidget(prompt_hint)
 
         # Reset button
         reset_btn = QPushButton("Reset to Default Prompt")
         reset_btn.clicked.connect(
-            lambda: self.prompt_editor.setPlainText(
-                get_default_prompt_template()
-            )
+            lambda: self.prompt_editor.setPlainText(get_default_prompt_template())
         )
         main_tab_layout.addWidget(reset_btn)
 
+        # Generated content is cached per word; allow wiping it
+        clear_cache_btn = QPushButton("Clear Cache")
+        clear_cache_btn.clicked.connect(self.clear_cache)
+        main_tab_layout.addWidget(clear_cache_btn)
+
+        export_btn = QPushButton("Export Config…")
+        export_btn.clicked.connect(self.export_config)
+        main_tab_layout.addWidget(export_btn)
+
         # Separator
         separator3 = QFrame()
         separator3.setFrameShape(QFrame.Shape.HLine)
@@ -224,7 +481,7 @@ class SettingsDialog(QDialog):
         word_layout.addWidget(QLabel("Word (base form):"))
         self.word_field_input = QComboBox()
         self.word_field_input.setEditable(True)
-        self.word_field_input.addItems(self.all_field_names)
+        _set_shared_items(self.word_field_input, "fields", self.all_field_names)
         self.word_field_input.setCurrentText(field_mapping.get("word_field", "Front"))
         word_layout.addWidget(self.word_field_input)
         main_tab_layout.addLayout(word_layout)
@@ -234,7 +491,7 @@ class SettingsDialog(QDialog):
         def_field_layout.addWidget(QLabel("Definition:"))
         self.def_field_input = QComboBox()
         self.def_field_input.setEditable(True)
-        self.def_field_input.addItems(self.all_field_names)
+        _set_shared_items(self.def_field_input, "fields", self.all_field_names)
         self.def_field_input.setCurrentText(
             field_mapping.get("definition_field", "Back")
         )
@@ -246,7 +503,7 @@ class SettingsDialog(QDialog):
         ex_field_layout.addWidget(QLabel("Example:"))
         self.ex_field_input = QComboBox()
         self.ex_field_input.setEditable(True)
-        self.ex_field_input.addItems(self.all_field_names)
+        _set_shared_items(self.ex_field_input, "fields", self.all_field_names)
         self.ex_field_input.setCurrentText(field_mapping.get("example_field", "Back"))
         ex_field_layout.addWidget(self.ex_field_input)
         main_tab_layout.addLayout(ex_field_layout)
@@ -258,12 +515,10 @@ class SettingsDialog(QDialog):
         help_label.setStyleSheet("color: gray; font-size: 11px;")
         main_tab_layout.addWidget(help_label)
 
-        main_tab_layout.addStretch()
-        main_tab.setLayout(main_tab_layout)
+    def _build_practice_tab(self, practice_tab_layout: "QVBoxLayout") -> None:
+        from aqt.qt import QComboBox, QHBoxLayout, QLabel, QPushButton, QTextEdit
 
-        # Tab 2: Reading Practice Settings
-        practice_tab = QWidget()
-        practice_tab_layout = QVBoxLayout()
+        from .ai_client import get_default_story_prompt_template
 
         # CEFR Level
         level_layout = QHBoxLayout()
@@ -286,10 +541,8 @@ class SettingsDialog(QDialog):
         self.length_combo.addItem("Medium (200-300 words)", "medium")
         self.length_combo.addItem("Long (400-500 words)", "long")
         current_length = self.config.get("story_length", "short")
-        for i in range(self.length_combo.count()):
-            if self.length_combo.itemData(i) == current_length:
-                self.length_combo.setCurrentIndex(i)
-                break
+        index = self.length_combo.findData(current_length)
+        self.length_combo.setCurrentIndex(index if index >= 0 else 0)
         length_layout.addWidget(self.length_combo)
         practice_tab_layout.addLayout(length_layout)
 
@@ -301,7 +554,9 @@ class SettingsDialog(QDialog):
             "Variables: {{words}}, {{level}}, {{word_count}}"
         )
         default_story_prompt = get_default_story_prompt_template()
-        current_story_prompt = self.config.get("story_prompt_template", "") or default_story_prompt
+        current_story_prompt = (
+            self.config.get("story_prompt_template", "") or default_story_prompt
+        )
         self.story_prompt_editor.setPlainText(current_story_prompt)
         practice_tab_layout.addWidget(self.story_prompt_editor)
 
@@ -314,85 +569,125 @@ class SettingsDialog(QDialog):
         )
         practice_tab_layout.addWidget(reset_story_btn)
 
-        practice_tab_layout.addStretch()
-        practice_tab.setLayout(practice_tab_layout)
+    def clear_cache(self) -> None:
+        from . import cache
 
-        # Add tabs
-        tabs.addTab(main_tab, "Main Settings")
-        tabs.addTab(practice_tab, "Reading Practice")
+        cache.clear()
+        showInfo("Cache cleared.")
 
-        main_layout.addWidget(tabs)
+    def export_config(self) -> None:
+        from aqt.qt import QFileDialog
 
-        # Buttons
-        buttons = QDialogButtonBox(
-            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Config", "lexiforge_config.json", "JSON (*.json)"
         )
-        buttons.accepted.connect(self.accept)
-        buttons.rejected.connect(self.reject)
-        main_layout.addWidget(buttons)
-
-        self.setLayout(main_layout)
+        if not path:
+            return
+        text = json.dumps(dict(get_config()), indent=4, ensure_ascii=False)
+        try:
+            Path(path).write_text(text + "\n", encoding="utf-8")
+        except OSError as e:
+            showInfo(f"Could not export config to {path}: {e}")
+            return
+        showInfo(f"Config exported to {path}")
 
     def load_models(self) -> None:
+        from aqt.qt import QApplication
+
+        from .ai_client import list_models
+
         api_key = self.api_key_input.text()
         if not api_key:
             showInfo("Please enter an API Key first.")
             return
 
+        # list_models() remembers the result for the key during the session;
+        # holding Shift while clicking forces a refresh
+        refresh = bool(
+            QApplication.keyboardModifiers() & Qt.KeyboardModifier.ShiftModifier
+        )
+
         self.load_models_btn.setEnabled(False)
         self.load_models_btn.setText("Loading...")
-        mw.app.processEvents()
 
-        try:
-            models = list_models(api_key)
-            self.model_combo.clear()
+        def on_done(future: "Future[list[dict[str, Any]]]") -> None:
+            from aqt.qt import sip
 
-            # Filter and sort models
-            # We want to show popular/free models first
+            # The dialog may have been closed while the request was running
+            if sip.isdeleted(self):
+                return
 
-            # Sort by name to have some order
-            models.sort(key=lambda x: x["name"])
+            try:
+                self._show_models(list(future.result()))
+            except Exception as e:
+                showInfo(f"Error loading models: {e}")
+            finally:
+                self.load_models_btn.setEnabled(True)
+                self.load_models_btn.setText("Load Models")
+
+        mw.taskman.run_in_background(
+            lambda: list_models(api_key, refresh=refresh), on_done
+        )
 
-            # Add top models (limit to 6 to avoid huge list)
-            for count, m in enumerate(models):
-                if count >= 6:
-                    break
-                model_name = m["name"].replace("models/", "")
-                self.model_combo.addItem(model_name)
+    def _show_models(self, models: list[dict[str, Any]]) -> None:
+        """Fill the model combo box from a list_models() result.
 
-            # Ensure current model is selected if present, or add it
-            current = self.config.get("model", DEFAULT_MODEL)
-            index = self.model_combo.findText(current)
-            if index >= 0:
-                self.model_combo.setCurrentIndex(index)
-            else:
-                self.model_combo.addItem(current)
-                self.model_combo.setCurrentText(current)
+        Args:
+            models: Model descriptions as returned by list_models().
+        """
+        from .ai_client import DEFAULT_MODEL
 
-            showInfo("Models loaded successfully!")
+        # Filter and sort models
+        # We want to show popular/free models first
 
-        except Exception as e:
-            showInfo(f"Error loading models: {e}")
-        finally:
-            self.load_models_btn.setEnabled(True)
-            self.load_models_btn.setText("Load Models")
+        # Sort by name to have some order, and keep the top models
+        # (limit to 6 to avoid huge list)
+        models.sort(key=lambda x: x["name"])
+        names = [m["name"].removeprefix("models/") for m in models[:6]]
+
+        # Ensure current model is selected if present, or add it
+        current = self.config.get("model", DEFAULT_MODEL)
+        if current not in names:
+            names.append(current)
+
+        # Fill in one batch without emitting a change signal per item
+        self.model_combo.blockSignals(True)
+        self.model_combo.clear()
+        self.model_combo.addItems(names)
+        self.model_combo.blockSignals(False)
+        self.model_combo.setCurrentIndex(names.index(current))
+
+        showInfo("Models loaded successfully!")
 
     def accept(self) -> None:
-        # Save config
-        self.config["api_key"] = self.api_key_input.text()
-        self.config["model"] = self.model_combo.currentText()
-        self.config["source_lang"] = self.source_lang_combo.currentText()
-        self.config["definition_lang"] = self.def_lang_combo.currentText()
-        self.config["prompt_template"] = self.prompt_editor.toPlainText()
-        self.config["field_mapping"] = {
-            "word_field": self.word_field_input.currentText() or "Front",
-            "definition_field": self.def_field_input.currentText() or "Back",
-            "example_field": self.ex_field_input.currentText() or "Back",
-        }
+        # Save config. Tabs that were never opened keep their loaded values.
+        if self._built[0]:
+            from .ai_client import clear_bad_models, is_default_prompt_template
+
+            # The key or model may have been fixed; let failed models be retried
+            clear_bad_models()
+
+            self.config["api_key"] = self.api_key_input.text()
+            self.config["model"] = self.model_combo.currentText()
+            self.config["source_lang"] = self.source_lang_combo.currentText()
+            self.config["definition_lang"] = self.def_lang_combo.currentText()
+            prompt_template = self.prompt_editor.toPlainText()
+            # An unmodified default is stored as "" so future default changes apply
+            if is_default_prompt_template(prompt_template):
+                prompt_template = ""
+            self.config["prompt_template"] = prompt_template
+            self.config["field_mapping"] = {
+                "word_field": self.word_field_input.currentText() or "Front",
+                "definition_field": self.def_field_input.currentText() or "Back",
+                "example_field": self.ex_field_input.currentText() or "Back",
+            }
         # Save Reading Practice settings
-        self.config["story_level"] = self.level_combo.currentText()
-        self.config["story_length"] = self.length_combo.currentData()
-        self.config["story_prompt_template"] = self.story_prompt_editor.toPlainText()
+        if self._built[1]:
+            self.config["story_level"] = self.level_combo.currentText()
+            self.config["story_length"] = self.length_combo.currentData()
+            self.config["story_prompt_template"] = (
+                self.story_prompt_editor.toPlainText()
+            )
         save_config(self.config)
         super().accept()
 
@@ -403,13 +698,19 @@ def open_settings() -> None:
     dialog.exec()
 
 
-def get_field_mapping(note: "Note", config: dict[str, Any]) -> tuple[str, str, str]:
+def get_field_mapping(
+    fields: "Sequence[str]", config: Mapping[str, Any]
+) -> tuple[str, str, str]:
     """
     Determine the field mapping based on note type and configuration.
-    Returns (word_field, def_field, ex_field)
-    """
-    fields = note.keys()
 
+    Args:
+        fields: Field names of the note, as returned by note.keys().
+        config: The add-on configuration.
+
+    Returns:
+        (word_field, def_field, ex_field)
+    """
     # If exactly 2 fields, automatically map to 1st and 2nd field
     if len(fields) == 2:
         return fields[0], fields[1], fields[1]
@@ -425,7 +726,8 @@ def get_field_mapping(note: "Note", config: dict[str, Any]) -> tuple[str, str, s
 
 def _validate_note_and_config(
     note: Optional["Note"],
-    conf: Optional[dict[str, Any]],
+    fields: "Sequence[str]",
+    conf: Optional[Mapping[str, Any]],
     word_field: str,
     def_field: str,
     ex_field: str,
@@ -439,18 +741,19 @@ def _validate_note_and_config(
         showInfo("Configuration not found. Please check config.json.")
         return False
 
+    present = set(fields)
     missing = []
-    if word_field not in note:
+    if word_field not in present:
         missing.append(word_field)
-    if def_field not in note:
+    if def_field not in present:
         missing.append(def_field)
-    if ex_field != def_field and ex_field not in note:
+    if ex_field != def_field and ex_field not in present:
         missing.append(ex_field)
 
     if missing:
         showInfo(
             f"Error: The following fields are missing in this note type: {', '.join(missing)}\n\n"
-            f"Detected fields: {', '.join(note.keys())}"
+            f"Detected fields: {', '.join(fields)}"
         )
         return False
 
@@ -463,21 +766,48 @@ def _validate_note_and_config(
 
 
 def _generate_audio_filename(target_word: str, source_lang: str) -> str:
-    """Generate a unique audio filename."""
-    safe_word = "".join(
-        [c for c in target_word if c.isalnum() or c in (" ", "-", "_")]
-    ).strip()
+    """
+    Generate a stable audio filename for the word.
+
+    The same word and language always map to the same file, so audio that is
+    already in the media folder can be reused instead of downloaded again.
+    """
+    from . import cache
+
+    safe_word = _FNAME_RE.sub("", target_word).strip()
     lang_code = get_lang_code(source_lang)
-    return f"lexiforge_{safe_word}_{lang_code}_{int(time.time())}.mp3"
+    digest = cache.make_key(target_word, lang_code)[:12]
+    return f"lexiforge_{safe_word}_{lang_code}_{digest}.mp3"
+
+
+def _audio_executor() -> "ThreadPoolExecutor":
+    """Return the shared pool used for audio downloads, creating it on first use."""
+    global _AUDIO_EXECUTOR
+    if _AUDIO_EXECUTOR is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        _AUDIO_EXECUTOR = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="lexiforge-audio"
+        )
+    return _AUDIO_EXECUTOR
 
 
 def _generate_content_and_audio(
     word: str,
     source_lang: str,
     definition_lang: str,
-    conf: dict[str, Any],
+    conf: Mapping[str, Any],
+    content: Optional[tuple[str, str, str]] = None,
 ) -> dict[str, Any]:
-    """Generate definition, examples, and audio for the word."""
+    """
+    Generate definition, examples, and audio for the word.
+
+    If content holds an already generated (definition, example, base_form),
+    e.g. from generate_content_batch(), only the audio is fetched.
+    """
+    from .ai_client import generate_content
+    from .tts_client import download_audio
+
     api_key = conf.get("api_key")
     if not api_key or "YOUR_KEY" in api_key:
         return {"error": "Please configure your API Key in Tools -> LexiForge Settings"}
@@ -485,14 +815,63 @@ def _generate_content_and_audio(
     model = conf.get("model", "gemini-flash-latest")
     prompt_template = conf.get("prompt_template", "") or None
 
-    definition, examples, base_form = generate_content(
-        word, source_lang, api_key, model, definition_lang, prompt_template
-    )
+    media_dir = Path(mw.col.media.dir())
+    speculative = None
 
-    target_word = base_form if base_form else word
-    filename = _generate_audio_filename(target_word, source_lang)
-    full_path = Path(mw.col.media.dir()) / filename
-    success = download_audio(target_word, source_lang, str(full_path))
+    def start_speculative_audio() -> None:
+        # Only on a cache miss: the base form is usually the word itself, so
+        # fetch its audio while Gemini is working instead of after it returns
+        nonlocal speculative
+        guess_path = media_dir / _generate_audio_filename(word, source_lang)
+        if guess_path.exists():
+            return
+        # Unique per thread, so overlapping requests for the same word never
+        # write to each other's file
+        part_path = guess_path.with_name(
+            f"{guess_path.stem}.{threading.get_ident()}.part"
+        )
+        # force: a .part left behind by a crash is not valid audio
+        future = _audio_executor().submit(
+            download_audio, word, source_lang, str(part_path), force=True
+        )
+        speculative = (future, part_path, guess_path)
+
+    success = False
+    try:
+        if content is None:
+            content = generate_content(
+                word,
+                source_lang,
+                api_key,
+                model,
+                definition_lang,
+                prompt_template,
+                cache_ttl=conf.get("cache_ttl_days", 30) * 86400,
+                on_miss=start_speculative_audio,
+            )
+        definition, examples, base_form = content
+
+        target_word = base_form if base_form else word
+        filename = _generate_audio_filename(target_word, source_lang)
+        full_path = media_dir / filename
+        if speculative is not None and speculative[2] == full_path:
+            future, part_path, _guess_path = speculative
+            if future.result():
+                part_path.replace(full_path)
+                speculative = None
+                success = True
+    finally:
+        # Wrong guess, failed download or an error from generate_content:
+        # drop the download (or its file once it finishes), so no stray
+        # .part files are left in the media folder
+        if speculative is not None:
+            future, part_path, _guess_path = speculative
+            future.cancel()
+            future.add_done_callback(
+                lambda _f, path=part_path: path.unlink(missing_ok=True)
+            )
+    if not success:
+        success = download_audio(target_word, source_lang, str(full_path))
 
     return {
         "definition": definition,
@@ -536,16 +915,29 @@ def on_generate_click(editor: "Editor") -> None:
     """Handler for the 'Generate' button click in the editor."""
     note = editor.note
     conf = get_config()
-    word_field, def_field, ex_field = get_field_mapping(note, conf)
+    fields = note.keys() if note else []
+    word_field, def_field, ex_field = get_field_mapping(fields, conf)
 
-    if not _validate_note_and_config(note, conf, word_field, def_field, ex_field):
+    if not _validate_note_and_config(
+        note, fields, conf, word_field, def_field, ex_field
+    ):
         return
 
+    from .ai_client import DEFAULT_MODEL
+
     word = note[word_field]
     source_lang = conf.get("source_lang", "English")
     definition_lang = conf.get("definition_lang", "English")
     model = conf.get("model", DEFAULT_MODEL)
 
+    # A double click or a second Ctrl+G while the first one is running would
+    # fetch the same audio and update the note twice; let the first one finish
+    job = (note.id or id(note), word)
+    if job in _EDITOR_JOBS:
+        tooltip(f"Already generating for {word}...")
+        return
+    _EDITOR_JOBS.add(job)
+
     mw.progress.start(label=f"Generating with {model}...", immediate=True)
 
     def background_op() -> dict[str, Any]:
@@ -555,6 +947,7 @@ def on_generate_click(editor: "Editor") -> None:
             return {"error": str(e)}
 
     def on_success(future: "Future[dict[str, Any]]") -> None:
+        _EDITOR_JOBS.discard(job)
         mw.progress.finish()
 
         try:
@@ -567,85 +960,160 @@ def on_generate_click(editor: "Editor") -> None:
             showInfo(f"Error: {result['error']}")
             return
 
-        word_field, def_field, ex_field = get_field_mapping(note, conf)
         _update_note_fields(note, result, word_field, def_field, ex_field)
         editor.loadNote()
 
     mw.taskman.run_in_background(background_op, on_success)
 
 
-def add_editor_button(buttons, editor):
+def add_editor_button(buttons: list[str], editor: "Editor") -> list[str]:
     # Use absolute path for icon to ensure it loads
-    addon_path = os.path.dirname(__file__)
-    icon_path = os.path.join(addon_path, ICON_NAME)
+    icon_path = str(Path(__file__).parent / ICON_NAME)
+
+    # The editor passes itself to func, so the handler can be used directly
+    buttons.append(
+        editor.addButton(
+            icon=icon_path,
+            cmd="lexiforge_generate",
+            func=on_generate_click,
+            tip=f"Generate with {ADDON_NAME} (Ctrl+G)",
+            keys="Ctrl+G",
+        )
+    )
+    return buttons
+
 
-    return [*buttons, editor.addButton(icon=icon_path, cmd="lexiforge_generate", func=lambda e=editor: on_generate_click(e), tip=f"Generate with {ADDON_NAME} (Ctrl+G)", keys="Ctrl+G")]  # noqa: E501
+def _setup_browser_menu(browser: "Browser") -> None:
+    # Imported on first Browser open; see the note on lazy imports above
+    from .browser import setup_browser_menu
+
+    setup_browser_menu(browser)
 
 
 # --- Story Generation from Studied Words ---
 
-def get_studied_words_today(deck_id: Optional[int] = None) -> list[str]:
+
+def _today_start_ms() -> int:
+    """
+    Get the start of the current Anki day in milliseconds.
+    Uses the scheduler's day cutoff so the user's rollover hour is respected.
+    """
+    return (mw.col.sched.day_cutoff - 86400) * 1000
+
+
+def _word_from_fields(flds: str) -> str:
+    """Clean the first field of a note (fields are 0x1f-separated) into a word."""
+    raw = flds.split("\x1f", 1)[0].strip()
+    # Remove HTML tags and sound tags
+    word = _CLEAN_RE.sub("", raw)
+    # Decode HTML entities like &nbsp;, &amp;, etc.
+    if "&" in word:
+        word = html.unescape(word)
+    return word.strip()
+
+
+def get_studied_word_counts_by_deck() -> dict[Optional[int], int]:
+    """
+    Count words studied today with interval >= 1 day, per deck.
+
+    Words are cleaned and deduplicated the same way as in
+    get_studied_words_today(), so the counts match what the deck picker
+    shows once a deck is selected.
+
+    Returns:
+        Mapping of deck ID to word count. The None key holds the total
+        across all decks.
+    """
+    if not mw or not mw.col:
+        return {}
+
+    rows = mw.col.db.all(
+        """
+        SELECT c.did, n.flds
+        FROM cards c
+        JOIN notes n ON c.nid = n.id
+        JOIN revlog r ON c.id = r.cid
+        WHERE r.id >= ?
+        AND c.ivl >= 1
+        GROUP BY c.did, n.id
+        """,
+        _today_start_ms(),
+    )
+
+    words_by_deck: dict[Optional[int], set[str]] = {None: set()}
+    for did, flds in rows:
+        word = _word_from_fields(flds)
+        if word:
+            words_by_deck.setdefault(did, set()).add(word)
+            words_by_deck[None].add(word)
+    return {did: len(words) for did, words in words_by_deck.items()}
+
+
+def get_studied_words_today(
+    deck_id: Optional[int] = None, limit: Optional[int] = None
+) -> list[str]:
     """
     Get words from cards studied today with interval >= 1 day.
 
     Args:
         deck_id: Optional deck ID to filter words. If None, get words from all decks.
+        limit: Optional maximum number of notes to read, most recently reviewed first.
 
     Returns:
-        List of words (from the first field of each card)
+        List of words (from the first field of each card), most recent first
     """
+    global _STUDIED_CACHE
     if not mw or not mw.col:
         return []
 
-    # Get today's timestamp (start of day in milliseconds)
-    today_start = int(time.time() - (time.time() % 86400)) * 1000
+    today_start = _today_start_ms()
 
-    # Query cards reviewed today with interval >= 1 day
+    # Any review made since the last call adds a revlog row with a larger id,
+    # which invalidates the cached words
+    last_review = mw.col.db.scalar(
+        "SELECT COALESCE(MAX(id), 0) FROM revlog WHERE id >= ?", today_start
+    )
+    stamp = (id(mw.col), today_start, last_review)
+    if _STUDIED_CACHE[0] != stamp:
+        _STUDIED_CACHE = (stamp, {})
+    words_by_deck = _STUDIED_CACHE[1]
+    cache_key = (deck_id, limit)
+    if cache_key in words_by_deck:
+        return words_by_deck[cache_key]
+
+    # Query notes of cards reviewed today with interval >= 1 day
     # ivl is in days, so we want ivl >= 1
+    query = """
+        SELECT n.flds
+        FROM cards c
+        JOIN notes n ON c.nid = n.id
+        JOIN revlog r ON c.id = r.cid
+        WHERE r.id >= ?
+        AND c.ivl >= 1
+        """
+    args: list[int] = [today_start]
     if deck_id is not None:
-        card_ids = mw.col.db.list(
-            """
-            SELECT DISTINCT c.id
-            FROM cards c
-            JOIN revlog r ON c.id = r.cid
-            WHERE r.id >= ?
-            AND c.ivl >= 1
-            AND c.did = ?
-            """,
-            today_start,
-            deck_id
-        )
-    else:
-        card_ids = mw.col.db.list(
-            """
-            SELECT DISTINCT c.id
-            FROM cards c
-            JOIN revlog r ON c.id = r.cid
-            WHERE r.id >= ?
-            AND c.ivl >= 1
-            """,
-            today_start
-        )
-
-    if not card_ids:
-        return []
-
-    # Get the words from the first field of each card's note
+        query += "AND c.did = ? "
+        args.append(deck_id)
+    # One row per note, most recently reviewed first so a limit keeps the
+    # freshest words
+    query += "GROUP BY n.id ORDER BY MAX(r.id) DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        args.append(limit)
+
+    rows = mw.col.db.list(query, *args)
+
+    # Get the words from the first field of each note
     words = []
-    for card_id in card_ids:
-        card = mw.col.get_card(card_id)
-        note = card.note()
-        if note and note.fields:
-            word = note.fields[0].strip()
-            # Remove HTML tags and sound tags
-            word = re.sub(r'<[^>]+>', '', word)
-            word = re.sub(r'\[sound:[^\]]+\]', '', word)
-            # Decode HTML entities like &nbsp;, &amp;, etc.
-            word = html.unescape(word)
-            word = word.strip()
-            if word and word not in words:
-                words.append(word)
-
+    seen: set[str] = set()
+    for flds in rows:
+        word = _word_from_fields(flds)
+        if word and word not in seen:
+            seen.add(word)
+            words.append(word)
+
+    words_by_deck[cache_key] = words
     return words
 
 
@@ -653,6 +1121,17 @@ class StoryDialog(QDialog):
     """Dialog to display generated story from studied words."""
 
     def __init__(self, parent: Optional[QDialog] = None) -> None:
+        from aqt.qt import (
+            QComboBox,
+            QDialogButtonBox,
+            QGroupBox,
+            QHBoxLayout,
+            QLabel,
+            QPushButton,
+            QTextEdit,
+            QVBoxLayout,
+        )
+
         super().__init__(parent)
         self.setWindowTitle(f"{ADDON_NAME} - Reading Practice")
         self.setMinimumSize(600, 500)
@@ -663,14 +1142,14 @@ class StoryDialog(QDialog):
         # Deck selection group
         deck_group = QGroupBox("Select Deck")
         deck_layout = QHBoxLayout()
-        
+
         self.deck_combo = QComboBox()
         self.deck_combo.currentIndexChanged.connect(self.on_deck_changed)
         deck_layout.addWidget(self.deck_combo)
-        
+
         self.word_count_label = QLabel()
         deck_layout.addWidget(self.word_count_label)
-        
+
         deck_group.setLayout(deck_layout)
         layout.addWidget(deck_group)
 
@@ -701,7 +1180,9 @@ class StoryDialog(QDialog):
         self.regenerate_btn = QPushButton("Regenerate")
         self.regenerate_btn.clicked.connect(self.regenerate_story)
         self.regenerate_btn.setEnabled(False)
-        button_box.addButton(self.regenerate_btn, QDialogButtonBox.ButtonRole.ActionRole)
+        button_box.addButton(
+            self.regenerate_btn, QDialogButtonBox.ButtonRole.ActionRole
+        )
 
         close_btn = button_box.addButton(QDialogButtonBox.StandardButton.Close)
         close_btn.clicked.connect(self.close)
@@ -713,7 +1194,7 @@ class StoryDialog(QDialog):
         # Initialize state
         self.words: list[str] = []
         self.current_story_generated = False
-        
+
         # Load decks
         self.load_decks()
 
@@ -721,24 +1202,23 @@ class StoryDialog(QDialog):
         """Load all decks with their studied word counts."""
         if not mw or not mw.col:
             return
-        
+
+        counts = get_studied_word_counts_by_deck()
+
+        # Populate without firing on_deck_changed for every added item
+        self.deck_combo.blockSignals(True)
         self.deck_combo.clear()
-        
+
         # Add "All Decks" option
-        all_words = get_studied_words_today()
-        self.deck_combo.addItem(f"All Decks ({len(all_words)} words)", None)
-        
-        # Add individual decks
-        deck_list = mw.col.decks.all_names_and_ids()
-        for deck in deck_list:
-            deck_id = deck.id
-            deck_name = deck.name
-            words = get_studied_words_today(deck_id)
-            word_count = len(words)
-            
-            # Add deck to combo with word count
-            self.deck_combo.addItem(f"{deck_name} ({word_count} words)", deck_id)
-        
+        self.deck_combo.addItem(f"All Decks ({counts.get(None, 0)} words)", None)
+
+        # Add individual decks with their word counts
+        for deck in mw.col.decks.all_names_and_ids():
+            word_count = counts.get(deck.id, 0)
+            self.deck_combo.addItem(f"{deck.name} ({word_count} words)", deck.id)
+
+        self.deck_combo.blockSignals(False)
+
         # Update word count label for initial selection
         self.on_deck_changed(0)
 
@@ -746,47 +1226,59 @@ class StoryDialog(QDialog):
         """Handle deck selection change."""
         if index < 0:
             return
-        
+
         deck_id = self.deck_combo.itemData(index)
         words = get_studied_words_today(deck_id)
-        
+
         self.word_count_label.setText(f"📚 {len(words)} word(s)")
-        
+
         if len(words) == 0:
-            self.info_label.setText("⚠️ No studied words found in this deck (interval ≥ 1 day)")
+            self.info_label.setText(
+                "⚠️ No studied words found in this deck (interval ≥ 1 day)"
+            )
             self.generate_btn.setEnabled(False)
             self.story_text.clear()
         else:
-            self.info_label.setText("Ready to generate a story with your studied words!")
+            self.info_label.setText(
+                "Ready to generate a story with your studied words!"
+            )
             self.generate_btn.setEnabled(True)
-        
+
         # Reset regenerate button when deck changes
         self.regenerate_btn.setEnabled(False)
         self.current_story_generated = False
 
     def generate_story(self) -> None:
         """Generate and display the story."""
+        from .ai_client import DEFAULT_MODEL, generate_story_with_words
+
         config = get_config()
         api_key = config.get("api_key")
 
         if not api_key or "YOUR_KEY" in api_key:
-            self.story_text.setText("Please configure your API Key in Tools → LexiForge Settings")
+            self.story_text.setText(
+                "Please configure your API Key in Tools → LexiForge Settings"
+            )
             return
 
         # Get selected deck
         current_index = self.deck_combo.currentIndex()
         deck_id = self.deck_combo.itemData(current_index)
-        
+
         # Get studied words from selected deck
-        self.words = get_studied_words_today(deck_id)
+        self.words = get_studied_words_today(deck_id, limit=STORY_WORD_LIMIT)
 
         if not self.words:
-            self.story_text.setText("No words found. Study some cards first!\n\nMake sure you have cards with interval ≥ 1 day that were reviewed today.")  # noqa: E501
+            self.story_text.setText(
+                "No words found. Study some cards first!\n\nMake sure you have cards with interval ≥ 1 day that were reviewed today."
+            )
             self.regenerate_btn.setEnabled(False)
             return
 
         deck_name = self.deck_combo.currentText()
-        self.story_text.setText(f"📚 Using {len(self.words)} words from {deck_name}\n\nWords: {', '.join(self.words[:10])}{'...' if len(self.words) > 10 else ''}\n\nGenerating story...")  # noqa: E501
+        self.story_text.setText(
+            f"📚 Using {len(self.words)} words from {deck_name}\n\nWords: {', '.join(self.words[:10])}{'...' if len(self.words) > 10 else ''}\n\nGenerating story..."
+        )
 
         self.generate_btn.setEnabled(False)
         self.regenerate_btn.setEnabled(False)
@@ -806,10 +1298,8 @@ class StoryDialog(QDialog):
         def on_done(future: "Future[str]") -> None:
             try:
                 story = future.result()
-                # Convert markdown bold (**text**) to HTML (<b>text</b>)
-                story_html = re.sub(r'\*\*([^*]+)\*\*', r'<b>\1</b>', story)
-                # Convert newlines to HTML breaks
-                story_html = story_html.replace('\n', '<br>')
+                # Convert **text** to <b>text</b> and newlines to <br>
+                story_html = _STORY_RE.sub(_story_html_repl, story)
                 self.story_text.setHtml(story_html)
                 self.generate_btn.setEnabled(True)
                 self.regenerate_btn.setEnabled(True)
@@ -819,10 +1309,7 @@ class StoryDialog(QDialog):
                 self.generate_btn.setEnabled(True)
                 self.regenerate_btn.setEnabled(False)
 
-        from concurrent.futures import ThreadPoolExecutor
-        executor = ThreadPoolExecutor(max_workers=1)
-        future = executor.submit(generate)
-        future.add_done_callback(lambda f: mw.taskman.run_on_main(lambda: on_done(f)))
+        mw.taskman.run_in_background(generate, on_done)
 
     def regenerate_story(self) -> None:
         """Regenerate the story with the same words."""
@@ -835,13 +1322,26 @@ def open_story_dialog() -> None:
     dialog.exec()
 
 
-# Initialize - always clean up old menu items before adding new ones
-# Remove any existing LexiForge menu items to prevent duplicates
-for action in list(mw.form.menuTools.actions()):
-    if action.text() in (f"{ADDON_NAME} Settings", f"{ADDON_NAME} Reading Practice"):
-        mw.form.menuTools.removeAction(action)
+def _close_connections() -> None:
+    """Close pooled HTTP connections and the cache database when the profile closes."""
+    from . import cache, http_client
+
+    http_client.close_all()
+    cache.close()
+
+
+# Initialize - always clean up old menu items before adding new ones.
+# The list is taken from the previous module globals on importlib.reload, so
+# the actions we added last time are removed directly instead of scanning
+# every entry of the Tools menu.
+_REGISTERED_ACTIONS: list[QAction] = globals().get("_REGISTERED_ACTIONS", [])
+for action in _REGISTERED_ACTIONS:
+    mw.form.menuTools.removeAction(action)
+_REGISTERED_ACTIONS.clear()
 
 addHook("setupEditorButtons", add_editor_button)
+gui_hooks.browser_menus_did_init.append(_setup_browser_menu)
+gui_hooks.profile_will_close.append(_close_connections)
 
 # Add menu items
 settings_action = QAction(f"{ADDON_NAME} Settings", mw)
@@ -851,3 +1351,5 @@ mw.form.menuTools.addAction(settings_action)
 story_action = QAction(f"{ADDON_NAME} Reading Practice", mw)
 story_action.triggered.connect(open_story_dialog)
 mw.form.menuTools.addAction(story_action)
+
+_REGISTERED_ACTIONS.extend((settings_action, story_action))
@@ -1,17 +1,212 @@
+import contextlib
 import json
 import logging
+import logging.handlers
+import random
 import re
+import threading
+import time
+import unicodedata
 import urllib.error
 import urllib.request
-from typing import Any, Optional
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Optional, Union
+
+try:
+    from . import cache
+    from .http_client import urlopen
+except ImportError:
+    import cache
+    from http_client import urlopen
+
+# Anki ships orjson, but fall back to the standard library when it is missing
+try:
+    import orjson
+
+    def _json_loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+except ImportError:
+
+    def _json_loads(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
 
 logger = logging.getLogger(__name__)
 
+# Full responses that could not be parsed go to a size-capped file in the
+# add-on folder; the handler opens the file on first use
+ERROR_LOG_PATH = Path(__file__).resolve().parent / "lexiforge_error.log"
+_error_log = logging.getLogger(f"{__name__}.errors")
+if not _error_log.handlers:
+    _handler = logging.handlers.RotatingFileHandler(
+        ERROR_LOG_PATH, maxBytes=1_000_000, backupCount=3, encoding="utf-8", delay=True
+    )
+    _handler.setFormatter(logging.Formatter("\n=== %(asctime)s ===\n%(message)s"))
+    _error_log.addHandler(_handler)
+
 DEFAULT_MODEL = "gemini-flash-latest"
 
+# generate_content() calls in progress, by content_cache_key()
+_INFLIGHT: "dict[str, Future[tuple[str, str, str]]]" = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+# list_models() results per _key_id(); filled on first successful call
+_MODELS_CACHE: dict[str, list[dict[str, Any]]] = {}
+# (_key_id(api_key), model) pairs that returned 404; see clear_bad_models()
+_BAD_MODELS: set[tuple[str, str]] = set()
+
+# Statuses worth retrying: timeouts, rate limits and transient server errors
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+# Upper bound for a single backoff sleep, including Retry-After (seconds)
+MAX_RETRY_DELAY = 8.0
+
+# Gemini REST endpoint; models are addressed as {_MODELS_URL}/{model}:method
+_MODELS_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+
+# Structured output for the default prompts; the answer comes back as JSON
+_WORD_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "base_form": {"type": "STRING"},
+        "definition": {"type": "STRING"},
+        "example": {"type": "STRING"},
+    },
+    "required": ["base_form", "definition", "example"],
+}
+_JSON_WORD_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": _WORD_SCHEMA,
+}
+# Batch items echo the word so answers are matched by it, not by position
+_BATCH_ITEM_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"word": {"type": "STRING"}, **_WORD_SCHEMA["properties"]},
+    "required": ["word", *_WORD_SCHEMA["required"]],
+}
+_JSON_BATCH_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": {"type": "ARRAY", "items": _BATCH_ITEM_SCHEMA},
+}
+
+# Markdown code fence some models wrap JSON answers in
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+# Labelled fields in the model's answer, see parse_response(). A value stays
+# on its label's line and stops at the next label, so an empty field or
+# several labels on one line do not swallow their neighbours.
+_RE_FIELDS = re.compile(
+    r"\b(BASE_FORM|DEFINITION|EXAMPLE):[^\S\n]*(.*?)"
+    r"(?=\s*\b(?:BASE_FORM|DEFINITION|EXAMPLE):|$)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Stripped from both ends of a word before lemma cache lookups
+_WORD_STRIP_CHARS = " \t\n.,!?;:\"'()[]«»“”\u2018\u2019¿¡…·"
+
+# Variables supported in the word prompt template
+_TEMPLATE_VAR_RE = re.compile(r"\{\{(word|source_lang|definition_lang)\}\}")
+
+# Variables supported in the batch prompt template
+_BATCH_VAR_RE = re.compile(r"\{\{(words|source_lang|definition_lang)\}\}")
+
+# A language detection header, the blank lines after it and at most one
+# "***"/"---" separator closing it
+_LANG_HEADER_RE = re.compile(
+    r"^.*(?:linguagem detectada|detected language).*"
+    r"(?:\n[^\S\n]*(?=\n|\Z))*"
+    r"(?:\n[^\S\n]*(?:\*\*\*|---)[^\S\n]*(?=\n|\Z))?\n?",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Story length -> (word count shown in the prompt, maxOutputTokens)
+_LENGTH_CONFIG = MappingProxyType(
+    {
+        "short": ("100-150 words", 1500),
+        "medium": ("200-300 words", 2500),
+        "long": ("400-500 words", 4000),
+    }
+)
+
+# Phrases of the default story prompt that assume the language is detected;
+# they are rewritten when a specific language is set
+_STORY_LANGUAGE_PHRASES = {
+    "Analyze the following words and detect their language": (
+        "Use the following words in {language}"
+    ),
+    "IN THE EXACT SAME LANGUAGE as these words": "in {language}",
+    "Detect the language of the words first": "",
+    "Write the ENTIRE story in that detected language": (
+        "Write the ENTIRE story in {language}"
+    ),
+    "in the detected language": "in {language}",
+}
+# Story template variables and the phrases above
+_STORY_SUB_RE = re.compile(
+    r"\{\{(words|level|word_count)\}\}|"
+    + "|".join(map(re.escape, _STORY_LANGUAGE_PHRASES))
+)
+
+# Prepended to the prompt when the source language is "Auto"
+AUTO_DETECT_PREFIX = (
+    "First, detect the language of the word and use that language as {{source_lang}}.\n"
+)
+
+_BATCH_AUTO_DETECT_PREFIX = (
+    "First, detect the language of the words and use that language as "
+    "{{source_lang}}.\n"
+)
+
+# Instructions shared by the single and batch prompts
+_WORD_STEPS = """\
+	1.	Find its base form (lemma).
+	2.	Translate this base form into {{definition_lang}}:
+	•	If it is a simple common word (e.g. ‘cat’, ‘milk’, ‘run’), give only a one-word translation in {{definition_lang}}.
+	•	Otherwise give the translation in {{definition_lang}} plus a very short 4-7 word definition in parentheses.
+	3.	Give 1 example sentence in {{source_lang}} using the base form."""  # noqa: RUF001
 
-def get_default_prompt_template() -> str:
-    return """Analyze the word ‘{{word}}’ in {{source_lang}}.
+_ANSWER_FORMAT = """\
+BASE_FORM: [base form in {{source_lang}}]
+DEFINITION: [translation/definition in {{definition_lang}}]
+EXAMPLE: [sentence in {{source_lang}} using the base form]"""
+
+# The same fields as _ANSWER_FORMAT, for prompts sent with a JSON schema
+_JSON_FIELDS = """\
+- base_form: the base form in {{source_lang}}
+- definition: the translation/definition in {{definition_lang}}
+- example: a sentence in {{source_lang}} using the base form"""
+
+# Put in front of every word prompt, default or custom, so the editable
+# template never decides the answer protocol. Requests carry the JSON schema;
+# streamed ones need the labelled lines to report fields before the end.
+_JSON_ANSWER_PREFIX = "Answer with a JSON object with these fields:\n" + _JSON_FIELDS
+_LABELLED_ANSWER_PREFIX = (
+    "Format the answer exactly as:\n"
+    + _ANSWER_FORMAT
+    + "\nDo not use markdown formatting."
+)
+
+# The editable instructions, without the answer format. The word goes last
+# so every request shares the same leading tokens, which lets Gemini's
+# implicit context caching reuse the prefix.
+DEFAULT_PROMPT_TEMPLATE = (
+    "Analyze the word given at the end in {{source_lang}}.\n"
+    + _WORD_STEPS
+    + "\n\nWord: {{word}}"
+)
+
+# The default prompt of earlier versions, which Settings saved verbatim into
+# the config; see is_default_prompt_template()
+_LEGACY_DEFAULT_PROMPT_TEMPLATE = """Analyze the word ‘{{word}}’ in {{source_lang}}.
 	1.	Find its base form (lemma).
 	2.	Translate this base form into {{definition_lang}}:
 	•	If it is a simple common word (e.g. ‘cat’, ‘milk’, ‘run’), give only a one-word translation in {{definition_lang}}.
@@ -23,12 +218,23 @@ BASE_FORM: [base form in {{source_lang}}]
 DEFINITION: [translation/definition in {{definition_lang}}]
 EXAMPLE: [sentence in {{source_lang}} using the base form]
 
-Do not use markdown formatting."""  # noqa: E501
+Do not use markdown formatting."""  # noqa: RUF001
 
+# Words per request in generate_content_batch()
+BATCH_SIZE = 20
 
-def get_default_story_prompt_template() -> str:
-    """Returns the default story prompt template with variable placeholders."""
-    return """Analyze the following words and detect their language: {{words}}
+# Several words in one request; same instructions as DEFAULT_PROMPT_TEMPLATE
+BATCH_PROMPT_TEMPLATE = (
+    "Analyze each of the numbered words given at the end in {{source_lang}}."
+    " For every word:\n"
+    + _WORD_STEPS
+    + "\n\nAnswer with a JSON array holding one object per word with these"
+    " fields:\n- word: the word exactly as given in the list, without its number\n"
+    + _JSON_FIELDS
+    + "\n\nWords:\n{{words}}"
+)
+
+DEFAULT_STORY_PROMPT_TEMPLATE = """Analyze the following words and detect their language: {{words}}
 
 Then create an engaging and educational short story ({{word_count}}) IN THE EXACT SAME LANGUAGE as these words.
 
@@ -47,7 +253,208 @@ Requirements:
 Format your response as:
 Title: [Story Title in the detected language]
 
-[Story text with **highlighted** words in the detected language]"""  # noqa: E501
+[Story text with **highlighted** words in the detected language]"""
+
+
+def _gemini_request(
+    url: str, api_key: str, body: Optional[dict[str, Any]] = None
+) -> urllib.request.Request:
+    """
+    Build a Gemini API request.
+
+    Args:
+        url: Endpoint URL.
+        api_key: Gemini API key.
+        body: JSON payload; the request is a GET when omitted.
+
+    Returns:
+        The request, ready for urlopen().
+    """
+    if body is None:
+        return urllib.request.Request(url, headers={"x-goog-api-key": api_key})
+    return urllib.request.Request(
+        url,
+        data=_json_dumps(body),
+        headers={"Content-Type": "application/json", "x-goog-api-key": api_key},
+    )
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str]) -> float:
+    """Seconds to wait before retry number ``attempt`` (starting at 0)."""
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_RETRY_DELAY)
+        except ValueError:
+            pass  # An HTTP date; fall back to exponential backoff
+    return min(2**attempt * 0.5 + random.uniform(0, 0.25), MAX_RETRY_DELAY)
+
+
+def _open_with_retry(
+    url: str,
+    api_key: str,
+    body: dict[str, Any],
+    timeout: float = 30,
+    max_retries: int = 3,
+) -> Any:
+    """
+    POST a JSON body to the Gemini API and return the open response.
+
+    Rate limits and transient server errors are retried up to max_retries
+    times with exponential backoff, honouring Retry-After when it is sent.
+
+    Args:
+        url: Endpoint URL.
+        api_key: Gemini API key.
+        body: JSON payload.
+        timeout: Socket timeout in seconds for each attempt.
+        max_retries: Retries after the first attempt.
+
+    Returns:
+        The response, to be used as a context manager.
+
+    Raises:
+        urllib.error.HTTPError: For non-retryable statuses, or the last
+            retryable one once retries are exhausted.
+        urllib.error.URLError: For connection failures.
+    """
+    req = _gemini_request(url, api_key, body)
+    attempt = 0
+    while True:
+        try:
+            return urlopen(req, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUSES or attempt >= max_retries:
+                raise
+            retry_after = e.headers.get("Retry-After") if e.headers else None
+            delay = _retry_delay(attempt, retry_after)
+            attempt += 1
+            logger.warning(
+                "HTTP %d from Gemini, retrying in %.1fs (%d/%d)",
+                e.code,
+                delay,
+                attempt,
+                max_retries,
+            )
+            e.close()
+            time.sleep(delay)
+
+
+def _post_json(
+    url: str, api_key: str, body: dict[str, Any], timeout: float = 30
+) -> Any:
+    """POST a JSON body and decode the JSON answer; see _open_with_retry()."""
+    with _open_with_retry(url, api_key, body, timeout) as response:
+        return _json_loads(response.read())
+
+
+def _post_stream(
+    url: str,
+    api_key: str,
+    body: dict[str, Any],
+    on_field: Callable[[str, str], None],
+    timeout: float = 30,
+) -> dict[str, Any]:
+    """
+    POST to a streamGenerateContent?alt=sse endpoint, reporting fields early.
+
+    Text deltas are fed to a _FieldStream as they arrive, so on_field fires
+    as soon as each labelled line is complete.
+
+    Returns:
+        A generateContent-shaped result holding the concatenated text, or an
+        empty dict if the stream carried no text.
+    """
+    fields = _FieldStream(on_field)
+    usage = None
+    with _open_with_retry(url, api_key, body, timeout) as response:
+        for line in response:
+            if not line.startswith(b"data:"):
+                continue
+            event = _json_loads(line[5:])
+            usage = event.get("usageMetadata", usage)
+            # Events without text (e.g. one carrying only finishReason) are skipped
+            with contextlib.suppress(KeyError, IndexError, TypeError):
+                fields.feed(event["candidates"][0]["content"]["parts"][0]["text"])
+    text = fields.close()
+    if not text:
+        return {}
+    result: dict[str, Any] = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+    if usage:
+        result["usageMetadata"] = usage
+    return result
+
+
+class _FieldStream:
+    """
+    Report BASE_FORM/DEFINITION/EXAMPLE lines of a streamed answer.
+
+    Deltas are appended to lists and joined once, so feeding a long answer
+    in many small chunks stays linear in its length.
+    """
+
+    def __init__(self, on_field: Callable[[str, str], None]) -> None:
+        self._on_field = on_field
+        self._chunks: list[str] = []
+        self._line: list[str] = []
+        self._seen: set[str] = set()
+
+    def feed(self, delta: str) -> None:
+        """Add a text delta and report every line it completes."""
+        self._chunks.append(delta)
+        if "\n" not in delta:
+            self._line.append(delta)
+            return
+        head, *complete, tail = delta.split("\n")
+        self._line.append(head)
+        self._report("".join(self._line))
+        for line in complete:
+            self._report(line)
+        self._line = [tail]
+
+    def close(self) -> str:
+        """Report the last line and return the whole text."""
+        self._report("".join(self._line))
+        self._line = []
+        return "".join(self._chunks)
+
+    def _report(self, line: str) -> None:
+        for match in _RE_FIELDS.finditer(line.replace("*", "")):
+            name = match.group(1).lower()
+            value = match.group(2).strip()
+            # As in parse_response(), the first non-empty value of each
+            # label wins
+            if value and name not in self._seen:
+                self._seen.add(name)
+                self._on_field(name, value)
+
+
+def get_default_prompt_template() -> str:
+    """
+    Returns the default word prompt template with variable placeholders.
+
+    The answer format is not part of it; generate_content() adds it to the
+    default and custom templates alike.
+    """
+    return DEFAULT_PROMPT_TEMPLATE
+
+
+def is_default_prompt_template(template: str) -> bool:
+    """
+    Tell whether a saved word prompt template is the default one.
+
+    Besides the current default this accepts the default of earlier
+    versions, which Settings stored verbatim on every save; such configs
+    would otherwise never pick up changes to the default.
+    """
+    return template.strip() in (
+        DEFAULT_PROMPT_TEMPLATE.strip(),
+        _LEGACY_DEFAULT_PROMPT_TEMPLATE.strip(),
+    )
+
+
+def get_default_story_prompt_template() -> str:
+    """Returns the default story prompt template with variable placeholders."""
+    return DEFAULT_STORY_PROMPT_TEMPLATE
 
 
 def generate_content(
@@ -57,6 +464,9 @@ def generate_content(
     model: str = DEFAULT_MODEL,
     definition_lang: str = "English",
     prompt_template: Optional[str] = None,
+    cache_ttl: Optional[float] = None,
+    on_field: Optional[Callable[[str, str], None]] = None,
+    on_miss: Optional[Callable[[], None]] = None,
 ) -> tuple[str, str, str]:
     """
     Generate word definition and example using Gemini API.
@@ -67,7 +477,17 @@ def generate_content(
         api_key: Gemini API key
         model: Model to use (default: gemini-flash-latest)
         definition_lang: Language for definition (default: "English")
-        prompt_template: Custom prompt template (uses default if None)
+        prompt_template: Custom prompt template (uses default if None); the
+            answer format is added in front of it
+        cache_ttl: If set, serve results younger than this many seconds from
+            the generation cache and store successful new results in it
+        on_field: If set, stream the answer and call on_field(name, value)
+            with "base_form", "definition" or "example" as soon as each
+            field is complete. Called on the requesting thread.
+        on_miss: If set, called on the requesting thread right before the API
+            is asked, i.e. once the generation cache turned out not to hold
+            the word. Not called when an identical request is already in
+            flight.
 
     Returns:
         Tuple of (definition, example, base_form)
@@ -78,282 +498,579 @@ def generate_content(
     if not api_key or not api_key.strip():
         raise ValueError("API key is required and cannot be empty")
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+    # Concurrent callers asking for the same word share one request
+    key = content_cache_key(word, source_lang, model, definition_lang, prompt_template)
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(key)
+        owner = future is None
+        if owner:
+            future = _INFLIGHT[key] = Future()
+    if not owner:
+        result = future.result()
+        if on_field is not None:
+            _report_fields(result, on_field)
+        return result
+
+    try:
+        result = _generate_content_deduped(
+            word,
+            source_lang,
+            api_key,
+            model,
+            definition_lang,
+            prompt_template,
+            cache_ttl,
+            on_field,
+            on_miss,
+        )
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _INFLIGHT_LOCK:
+            del _INFLIGHT[key]
+
+
+def _generate_content_deduped(
+    word: str,
+    source_lang: str,
+    api_key: str,
+    model: str,
+    definition_lang: str,
+    prompt_template: Optional[str],
+    cache_ttl: Optional[float],
+    on_field: Optional[Callable[[str, str], None]],
+    on_miss: Optional[Callable[[], None]],
+) -> tuple[str, str, str]:
+    """Serve generate_content() from the cache or the API; one call per key."""
+    if cache_ttl is None:
+        if on_miss is not None:
+            on_miss()
+        return _generate_content_uncached(
+            word,
+            source_lang,
+            api_key,
+            model,
+            definition_lang,
+            prompt_template,
+            on_field,
+        )
+
+    cached = get_cached_content(
+        word, source_lang, model, definition_lang, prompt_template, cache_ttl
+    )
+    if cached is not None:
+        if on_field is not None:
+            _report_fields(cached, on_field)
+        return cached
+
+    if on_miss is not None:
+        on_miss()
+    result = _generate_content_uncached(
+        word, source_lang, api_key, model, definition_lang, prompt_template, on_field
+    )
+    _store_cached(
+        word, result, source_lang, model, definition_lang, prompt_template, cache_ttl
+    )
+    return result
+
+
+def _report_fields(
+    result: tuple[str, str, str], on_field: Callable[[str, str], None]
+) -> None:
+    """Pass a finished result to an on_field callback, field by field."""
+    definition, example, base_form = result
+    on_field("base_form", base_form)
+    on_field("definition", definition)
+    on_field("example", example)
+
+
+def _store_cached(
+    word: str,
+    result: tuple[str, str, str],
+    source_lang: str,
+    model: str,
+    definition_lang: str,
+    prompt_template: Optional[str],
+    ttl: float,
+) -> None:
+    """Put a generate_content() result into the generation cache."""
+    definition, example, base_form = result
+    # Error paths return an empty example; only cache real results
+    if not (definition and example):
+        return
+    value = list(result)
+    cache.put(
+        content_cache_key(word, source_lang, model, definition_lang, prompt_template),
+        value,
+    )
+    # Let case/punctuation variants of the word and other inflections of
+    # the same lemma hit too, without overwriting an existing lemma entry
+    for form in {normalize_word(word), normalize_word(base_form)} - {""}:
+        lemma_key = _lemma_cache_key(
+            form, source_lang, model, definition_lang, prompt_template
+        )
+        if cache.get(lemma_key, ttl) is None:
+            cache.put(lemma_key, value)
+
+
+def content_cache_key(
+    word: str,
+    source_lang: str,
+    model: str = DEFAULT_MODEL,
+    definition_lang: str = "English",
+    prompt_template: Optional[str] = None,
+) -> str:
+    """
+    Build the generation cache key for a word lookup.
+
+    The API key is deliberately not part of it, so cached results survive a
+    key change and the key never reaches the cache file.
+    """
+    return cache.make_key(model, source_lang, definition_lang, prompt_template, word)
+
+
+def get_cached_content(
+    word: str,
+    source_lang: str,
+    model: str,
+    definition_lang: str,
+    prompt_template: Optional[str],
+    ttl: float,
+) -> Optional[tuple[str, str, str]]:
+    """
+    Look up a previous generate_content() result without calling the API.
+
+    The exact word is tried first, then its normalised form, which also
+    matches the base form of earlier lookups (e.g. "ran" after "run").
+
+    Returns:
+        The cached (definition, example, base_form), or None if missing or
+        older than ttl seconds.
+    """
+    cached = cache.get(
+        content_cache_key(word, source_lang, model, definition_lang, prompt_template),
+        ttl,
+    )
+    if cached is None:
+        cached = cache.get(
+            _lemma_cache_key(
+                normalize_word(word),
+                source_lang,
+                model,
+                definition_lang,
+                prompt_template,
+            ),
+            ttl,
+        )
+    return tuple(cached) if cached is not None else None
 
+
+def normalize_word(word: str) -> str:
+    """
+    Reduce a word to the form used for lemma cache lookups.
+
+    Applies NFKC normalisation, case folding and strips surrounding
+    whitespace and punctuation, so "Running." and "running" match.
+    """
+    return unicodedata.normalize("NFKC", word).casefold().strip(_WORD_STRIP_CHARS)
+
+
+def _lemma_cache_key(
+    form: str,
+    source_lang: str,
+    model: str,
+    definition_lang: str,
+    prompt_template: Optional[str],
+) -> str:
+    """Build the cache key for a normalised word or base form."""
+    return cache.make_key(
+        "lemma", model, source_lang, definition_lang, prompt_template, form
+    )
+
+
+def _generate_content_uncached(
+    word: str,
+    source_lang: str,
+    api_key: str,
+    model: str,
+    definition_lang: str,
+    prompt_template: Optional[str],
+    on_field: Optional[Callable[[str, str], None]] = None,
+) -> tuple[str, str, str]:
+    """Request a definition and example from Gemini; see generate_content()."""
+    if (_key_id(api_key), model) in _BAD_MODELS:
+        logger.error("Model %s was not found earlier; skipping the request", model)
+        return "API Error: 404", "", word
+
+    body: dict[str, Any] = {}
     if prompt_template is None:
-        prompt_template = get_default_prompt_template()
+        prompt_template = DEFAULT_PROMPT_TEMPLATE
+    if on_field is None:
+        prompt_template = _JSON_ANSWER_PREFIX + "\n\n" + prompt_template
+        body["generationConfig"] = _JSON_WORD_CONFIG
+    else:
+        prompt_template = _LABELLED_ANSWER_PREFIX + "\n\n" + prompt_template
 
     actual_source = source_lang
     if source_lang.lower() == "auto":
-        prompt_template = f"""First, detect the language of the word '{{{{word}}}}' and use that language as {{{{source_lang}}}}.
-{prompt_template}"""
+        # Kept free of the word itself so the prompt prefix stays cacheable
+        prompt_template = AUTO_DETECT_PREFIX + prompt_template
         actual_source = "the detected language"
 
-    # Replace template variables
-    prompt = prompt_template.replace("{{word}}", word)
-    prompt = prompt.replace("{{source_lang}}", actual_source)
-    prompt = prompt.replace("{{definition_lang}}", definition_lang)
-
-    data = {"contents": [{"parts": [{"text": prompt}]}]}
-
-    headers = {
-        "Content-Type": "application/json",
-        "x-goog-api-key": api_key,
+    # Replace template variables in a single pass
+    values = {
+        "word": word,
+        "source_lang": actual_source,
+        "definition_lang": definition_lang,
     }
+    prompt = _TEMPLATE_VAR_RE.sub(lambda m: values[m.group(1)], prompt_template)
 
     try:
-        req = urllib.request.Request(
-            url, data=json.dumps(data).encode("utf-8"), headers=headers
-        )
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode("utf-8"))
+        body["contents"] = [{"parts": [{"text": prompt}]}]
+        if on_field is None:
+            result = _post_json(f"{_MODELS_URL}/{model}:generateContent", api_key, body)
+        else:
+            result = _post_stream(
+                f"{_MODELS_URL}/{model}:streamGenerateContent?alt=sse",
+                api_key,
+                body,
+                on_field,
+            )
 
-        # Parse response
+        # Parse response; a missing or malformed level raises and is reported below
         try:
-            # Safely extract nested values with checks
-            candidates = result.get("candidates")
-            if not candidates or not isinstance(candidates, list) or len(candidates) == 0:
-                raise KeyError("Missing or empty 'candidates' in result")
-            candidate = candidates[0]
-            content = candidate.get("content")
-            if not content or not isinstance(content, dict):
-                raise KeyError("Missing or invalid 'content' in candidate")
-            parts = content.get("parts")
-            if not parts or not isinstance(parts, list) or len(parts) == 0:
-                raise KeyError("Missing or empty 'parts' in content")
-            part = parts[0]
-            text = part.get("text")
-            if text is None:
-                raise KeyError("Missing 'text' in part")
-            logger.debug(f"Raw Response: {text}")
+            text = result["candidates"][0]["content"]["parts"][0]["text"]
+            logger.debug("Raw Response: %s", text)
+            usage = result.get("usageMetadata") or {}
+            if usage.get("cachedContentTokenCount"):
+                logger.debug(
+                    "Implicit cache hit: %s of %s prompt tokens",
+                    usage["cachedContentTokenCount"],
+                    usage.get("promptTokenCount"),
+                )
             return parse_response(text)
         except (KeyError, IndexError, TypeError) as e:
-            logger.error(f"Error parsing response: {e}")
+            logger.error("Error parsing response: %s", e)
             return (
                 "Error parsing AI response",
                 "",
                 word,
             )
 
-
     except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8")
-        logger.error(f"HTTP Error {e.code}: {error_body}")
+        # Only logged; the caller just sees the status code
+        logger.error("HTTP Error %d: %s", e.code, e.read().decode("utf-8", "replace"))
 
         if e.code == 404:
+            # Fail fast for this model until the settings are saved again
+            _BAD_MODELS.add((_key_id(api_key), model))
             logger.info("Model not found. Listing available models...")
             list_models(api_key)
 
         return f"API Error: {e.code}", "", word
     except urllib.error.URLError as e:
-        logger.error(f"Network Error: {e}")
+        logger.error("Network Error: %s", e)
         return f"Network Error: {e.reason}", "", word
     except Exception as e:
-        logger.exception(f"Unexpected error: {e}")
+        logger.exception("Unexpected error: %s", e)
         return f"Error: {e!s}", "", word
 
 
-def parse_response(text: str) -> tuple[str, str, str]:
+def generate_content_batch(
+    words: list[str],
+    source_lang: str,
+    api_key: str,
+    model: str = DEFAULT_MODEL,
+    definition_lang: str = "English",
+    prompt_template: Optional[str] = None,
+    max_workers: int = 8,
+    cache_ttl: Optional[float] = None,
+) -> list[tuple[str, str, str]]:
     """
-    Parse the AI response text to extract definition, example, and base form.
+    Generate definitions and examples for several words.
+
+    With the default prompt, words missing from the cache are sent up to
+    BATCH_SIZE per request; any word without an answer that echoes it falls
+    back to its own generate_content() call. Custom prompts are per-word, so
+    those words are requested individually. Requests run on a thread pool so
+    their network latency overlaps; results are returned in the order of
+    ``words``.
 
     Args:
-        text: The raw text response from the AI.
+        words: The words to analyze
+        source_lang: Language of the words or "Auto" for auto-detection
+        api_key: Gemini API key
+        model: Model to use (default: gemini-flash-latest)
+        definition_lang: Language for definitions (default: "English")
+        prompt_template: Custom prompt template (uses default if None)
+        max_workers: Maximum number of requests in flight
+        cache_ttl: If set, serve and store results through the generation
+            cache as generate_content() does
 
     Returns:
-        Tuple of (definition, example, base_form)
-    """
-    definition = ""
-    example = ""
-    base_form = ""
+        List of (definition, example, base_form) tuples, one per word
 
-    # Remove any markdown formatting if present
-    text = text.replace("**", "").replace("*", "")
-
-    # Use regex for more robust parsing
-    base_form_match = re.search(r"BASE_FORM:\s*(.+)", text, re.IGNORECASE)
-    definition_match = re.search(r"DEFINITION:\s*(.+)", text, re.IGNORECASE)
-    example_match = re.search(r"EXAMPLE:\s*(.+)", text, re.IGNORECASE)
+    Raises:
+        ValueError: If api_key is empty or None
+    """
+    if not api_key or not api_key.strip():
+        raise ValueError("API key is required and cannot be empty")
 
-    base_form = base_form_match.group(1).strip() if base_form_match else ""
-    definition = definition_match.group(1).strip() if definition_match else ""
-    example = example_match.group(1).strip() if example_match else ""
+    results: list[Optional[tuple[str, str, str]]] = [None] * len(words)
+    if cache_ttl is not None:
+        results = [
+            get_cached_content(
+                word, source_lang, model, definition_lang, prompt_template, cache_ttl
+            )
+            for word in words
+        ]
+    pending = list(dict.fromkeys(w for w, r in zip(words, results) if r is None))
+    if not pending:
+        return results
+
+    fetched: dict[str, tuple[str, str, str]] = {}
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(pending)), thread_name_prefix="lexiforge-ai"
+    ) as pool:
+        if prompt_template is None and len(pending) > 1:
+            chunks = [
+                pending[i : i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)
+            ]
+            answers = pool.map(
+                lambda chunk: _generate_batch_uncached(
+                    chunk, source_lang, api_key, model, definition_lang
+                ),
+                chunks,
+            )
+            for chunk, parsed in zip(chunks, answers):
+                for word, result in zip(chunk, parsed):
+                    if result is None:
+                        continue
+                    fetched[word] = result
+                    if cache_ttl is not None:
+                        _store_cached(
+                            word,
+                            result,
+                            source_lang,
+                            model,
+                            definition_lang,
+                            None,
+                            cache_ttl,
+                        )
+
+        rest = [word for word in pending if word not in fetched]
+        fetched.update(
+            zip(
+                rest,
+                pool.map(
+                    lambda word: generate_content(
+                        word,
+                        source_lang,
+                        api_key,
+                        model,
+                        definition_lang,
+                        prompt_template,
+                        cache_ttl,
+                    ),
+                    rest,
+                ),
+            )
+        )
 
-    return definition, example, base_form
+    return [r if r is not None else fetched[w] for w, r in zip(words, results)]
 
 
-def list_models(api_key: str) -> list[dict[str, Any]]:
+def _generate_batch_uncached(
+    words: list[str],
+    source_lang: str,
+    api_key: str,
+    model: str,
+    definition_lang: str,
+) -> list[Optional[tuple[str, str, str]]]:
     """
-    List available models from the Gemini API.
-
-    Args:
-        api_key: The API key to use.
+    Ask Gemini about several words in one request.
 
     Returns:
-        A list of model dictionaries.
+        One (definition, example, base_form) per word, or None for words
+        without a complete answer echoing them. Every entry is None if the
+        request fails.
     """
-    url = "https://generativelanguage.googleapis.com/v1beta/models"
-    headers = {"x-goog-api-key": api_key}
+    if (_key_id(api_key), model) in _BAD_MODELS:
+        return [None] * len(words)
+
+    prompt_template = BATCH_PROMPT_TEMPLATE
+    actual_source = source_lang
+    if source_lang.lower() == "auto":
+        prompt_template = _BATCH_AUTO_DETECT_PREFIX + prompt_template
+        actual_source = "the detected language"
+    numbered = "\n".join(f"{i}. {word}" for i, word in enumerate(words, 1))
+    values = {
+        "words": numbered,
+        "source_lang": actual_source,
+        "definition_lang": definition_lang,
+    }
+    prompt = _BATCH_VAR_RE.sub(lambda m: values[m.group(1)], prompt_template)
 
     try:
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode("utf-8"))
-            models = result.get("models", [])
-            logger.info("Available Models:")
-            for m in models:
-                logger.info(f"- {m['name']} ({m.get('displayName', '')})")
-            return models
+        result = _post_json(
+            f"{_MODELS_URL}/{model}:generateContent",
+            api_key,
+            {
+                "contents": [{"parts": [{"text": prompt}]}],
+                "generationConfig": _JSON_BATCH_CONFIG,
+            },
+            timeout=60,
+        )
+        text = result["candidates"][0]["content"]["parts"][0]["text"]
     except Exception as e:
-        logger.error(f"Error listing models: {e}")
-        return []
+        # The per-word fallback reports errors to the user
+        logger.warning("Batch request for %d words failed: %s", len(words), e)
+        return [None] * len(words)
+
+    logger.debug("Raw Batch Response: %s", text)
+    items = _loads_json_answer(text)
+    if not isinstance(items, list):
+        logger.warning("Batch response is not a JSON array")
+        return [None] * len(words)
+
+    # Answers keyed by the echoed word, exactly and normalised; a key
+    # answered twice is ambiguous and maps to None
+    exact: dict[str, Optional[tuple[str, str, str]]] = {}
+    loose: dict[str, Optional[tuple[str, str, str]]] = {}
+    for item in items:
+        answer = _fields_from_json(item)
+        echoed = item.get("word") if isinstance(item, dict) else None
+        if not isinstance(echoed, str) or not (answer[0] and answer[1]):
+            continue
+        for table, key in ((exact, echoed.strip()), (loose, normalize_word(echoed))):
+            table[key] = None if key in table else answer
+
+    matched = [
+        exact[word.strip()]
+        if word.strip() in exact
+        else loose.get(normalize_word(word))
+        for word in words
+    ]
+    missing = matched.count(None)
+    if missing:
+        logger.warning(
+            "Batch response has no answer for %d of %d words", missing, len(words)
+        )
+    return matched
 
 
-def generate_story_with_words(
-    words: list[str],
-    api_key: str,
-    model: str,
-    language: str = "English",
-    level: str = "B1",
-    length: str = "short",
-    prompt_template: Optional[str] = None
-) -> str:
+def parse_response(text: str) -> tuple[str, str, str]:
     """
-    Generate a story using the given words via Gemini API.
+    Parse the AI response text to extract definition, example, and base form.
+
+    Accepts the JSON object requested with the response schema as well as
+    the labelled BASE_FORM/DEFINITION/EXAMPLE lines of streamed answers.
 
     Args:
-        words: List of words to include in the story
-        api_key: Gemini API key
-        model: Model name to use
-        language: Target language for the story (source language of the words)
-        level: CEFR level (A1, A2, B1, B2, C1, C2)
-        length: Story length (short, medium, long)
-        prompt_template: Custom prompt template (uses default if None)
+        text: The raw text response from the AI.
 
     Returns:
-        Generated story text
+        Tuple of (definition, example, base_form)
     """
-    if not words:
-        return "No words available to generate a story."
+    obj = _loads_json_answer(text)
+    if isinstance(obj, dict):
+        return _fields_from_json(obj)
 
-    words_list = ", ".join(words[:30])  # Limit to 30 words for reasonable story
+    # Remove any markdown formatting if present
+    if "*" in text:
+        text = text.replace("*", "")
 
-    # Map length to word count and token limit
-    length_config = {
-        "short": {"words": "100-150 words", "tokens": 1500},
-        "medium": {"words": "200-300 words", "tokens": 2500},
-        "long": {"words": "400-500 words", "tokens": 4000},
-    }
+    # Scan the text once; the first non-empty value of each label wins
+    found: dict[str, str] = {}
+    for match in _RE_FIELDS.finditer(text):
+        value = match.group(2).strip()
+        if value:
+            found.setdefault(match.group(1).upper(), value)
 
-    config = length_config.get(length, length_config["short"])
-    word_count = config["words"]
-    max_tokens = config["tokens"]
+    definition = found.get("DEFINITION", "")
+    example = found.get("EXAMPLE", "")
+    base_form = found.get("BASE_FORM", "")
 
-    if prompt_template is None:
-        prompt_template = get_default_story_prompt_template()
-
-    # Replace template variables
-    prompt = prompt_template.replace("{{words}}", words_list)
-    prompt = prompt.replace("{{level}}", level)
-    prompt = prompt.replace("{{word_count}}", word_count)
-
-    # Handle Auto language detection - modify prompt if needed
-    if language.lower() != "auto":
-        # If specific language is set, ensure prompt uses it
-        prompt = prompt.replace(
-            "Analyze the following words and detect their language",
-            f"Use the following words in {language}"
-        )
-        prompt = prompt.replace(
-            "IN THE EXACT SAME LANGUAGE as these words",
-            f"in {language}"
-        )
-        prompt = prompt.replace("Detect the language of the words first", "")
-        prompt = prompt.replace("Write the ENTIRE story in that detected language", f"Write the ENTIRE story in {language}")
-        prompt = prompt.replace("in the detected language", f"in {language}")
+    return definition, example, base_form
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
 
-    request_body = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {
-            "temperature": 0.9,
-            "topK": 40,
-            "topP": 0.95,
-            "maxOutputTokens": max_tokens,
-        },
-    }
-
-    headers = {
-        "Content-Type": "application/json",
-        "x-goog-api-key": api_key,
-    }
+def _loads_json_answer(text: str) -> Any:
+    """
+    Decode a JSON answer, tolerating a surrounding ```json fence.
 
+    Returns:
+        The decoded value, or None if the text is not JSON.
+    """
+    text = _FENCE_RE.sub("", text.strip())
+    if not text.startswith(("{", "[")):
+        return None
     try:
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(request_body).encode("utf-8"),
-            headers=headers,
-        )
+        return _json_loads(text)
+    except ValueError:
+        return None
 
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode("utf-8"))
 
-        # Parse response with error handling
-        try:
-            story = result["candidates"][0]["content"]["parts"][0]["text"]
+def _fields_from_json(obj: Any) -> tuple[str, str, str]:
+    """Return (definition, example, base_form) from a decoded JSON answer."""
+    if not isinstance(obj, dict):
+        return "", "", ""
 
-            # Clean up the story - remove language detection lines if present
-            lines = story.split('\n')
-            cleaned_lines = []
-            skip_next = False
-
-            for line in lines:
-                # Skip language detection headers
-                if 'linguagem detectada' in line.lower() or 'detected language' in line.lower():
-                    skip_next = True
-                    continue
-                # Skip separator lines after detection
-                if skip_next and (line.strip() == '***' or line.strip() == '---' or line.strip() == ''):
-                    if line.strip() in ('***', '---'):
-                        skip_next = False
-                    continue
-                skip_next = False
-                cleaned_lines.append(line)
-
-            story = '\n'.join(cleaned_lines).strip()
-            return story
-        except (KeyError, IndexError) as e:
-            # Create detailed error message for user
-            error_details = f"Parsing Error: {e!s}\n\n"
-            error_details += "API Response Keys: " + str(list(result.keys())) + "\n\n"
+    def field(name: str) -> str:
+        value = obj.get(name)
+        return value.strip() if isinstance(value, str) else ""
 
-            if "candidates" in result:
-                error_details += f"Candidates count: {len(result.get('candidates', []))}\n"
-                if result.get('candidates'):
-                    candidate = result['candidates'][0]
-                    error_details += f"Candidate keys: {list(candidate.keys())}\n"
-                    if 'content' in candidate:
-                        error_details += f"Content keys: {list(candidate['content'].keys())}\n"
+    return field("definition"), field("example"), field("base_form")
 
-            # Also write to a log file for debugging
-            log_path = os.path.expanduser("~/Library/Application Support/Anki2/lexiforge_error.log")
-            with open(log_path, "a") as f:
-                f.write(f"\n=== {datetime.datetime.now()} ===\n")
-                f.write(error_details)
-                f.write("\nFull response:\n")
-                f.write(json.dumps(result, indent=2))
-                f.write("\n")
 
-            return f"❌ Parsing Error\n\n{error_details}\n\nFull log saved to:\n{log_path}"
+def list_models(api_key: str, refresh: bool = False) -> list[dict[str, Any]]:
+    """
+    List available models from the Gemini API.
 
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8")
-        logger.error(f"LexiForge Story HTTP Error {e.code}: {error_body}")
-        return f"API Error: {e.code}\n\n{error_body}"
+    A successful result is remembered for the rest of the session.
+
+    Args:
+        api_key: The API key to use.
+        refresh: Ask the API again even if a remembered result exists.
+
+    Returns:
+        A list of model dictionaries.
+    """
+    key_id = _key_id(api_key)
+    if not refresh and key_id in _MODELS_CACHE:
+        return _MODELS_CACHE[key_id]
+
+    try:
+        req = _gemini_request(_MODELS_URL, api_key)
+        with urlopen(req, timeout=30) as response:
+            result = _json_loads(response.read())
+            models = result.get("models", [])
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Available Models:\n%s",
+                    "\n".join(
+                        f"- {m['name']} ({m.get('displayName', '')})" for m in models
+                    ),
+                )
     except Exception as e:
-        logger.error(f"LexiForge Story Error: {e}")
-        return f"Error generating story: {e!s}"
+        logger.error("Error listing models: %s", e)
+        return []
+    if models:
+        _MODELS_CACHE[key_id] = models
+    return models
+
+
+def clear_bad_models() -> None:
+    """Forget models that returned 404, e.g. after the settings were saved."""
+    _BAD_MODELS.clear()
+
+
+def _key_id(api_key: str) -> str:
+    """Short digest identifying an API key without keeping the key itself."""
+    return cache.make_key(api_key)[:16]
 
 
 def generate_story_with_words(
@@ -363,7 +1080,7 @@ def generate_story_with_words(
     language: str = "English",
     level: str = "B1",
     length: str = "short",
-    prompt_template: Optional[str] = None
+    prompt_template: Optional[str] = None,
 ) -> str:
     """
     Generate a story using the given words via Gemini API.
@@ -386,40 +1103,25 @@ def generate_story_with_words(
     words_list = ", ".join(words[:30])  # Limit to 30 words for reasonable story
 
     # Map length to word count and token limit
-    length_config = {
-        "short": {"words": "100-150 words", "tokens": 1500},
-        "medium": {"words": "200-300 words", "tokens": 2500},
-        "long": {"words": "400-500 words", "tokens": 4000},
-    }
-
-    config = length_config.get(length, length_config["short"])
-    word_count = config["words"]
-    max_tokens = config["tokens"]
+    word_count, max_tokens = _LENGTH_CONFIG.get(length, _LENGTH_CONFIG["short"])
 
     if prompt_template is None:
-        prompt_template = get_default_story_prompt_template()
-
-    # Replace template variables
-    prompt = prompt_template.replace("{{words}}", words_list)
-    prompt = prompt.replace("{{level}}", level)
-    prompt = prompt.replace("{{word_count}}", word_count)
-
-    # Handle Auto language detection - modify prompt if needed
-    if language.lower() != "auto":
-        # If specific language is set, ensure prompt uses it
-        prompt = prompt.replace(
-            "Analyze the following words and detect their language",
-            f"Use the following words in {language}"
-        )
-        prompt = prompt.replace(
-            "IN THE EXACT SAME LANGUAGE as these words",
-            f"in {language}"
-        )
-        prompt = prompt.replace("Detect the language of the words first", "")
-        prompt = prompt.replace("Write the ENTIRE story in that detected language", f"Write the ENTIRE story in {language}")
-        prompt = prompt.replace("in the detected language", f"in {language}")
+        prompt_template = DEFAULT_STORY_PROMPT_TEMPLATE
+
+    # Replace template variables and, if a specific language is set, the
+    # language-detection phrases in a single pass
+    values = {"words": words_list, "level": level, "word_count": word_count}
+    detect = language.lower() == "auto"
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+    def substitute(match: re.Match) -> str:
+        name = match.group(1)
+        if name is not None:
+            return values[name]
+        if detect:
+            return match.group(0)
+        return _STORY_LANGUAGE_PHRASES[match.group(0)].format(language=language)
+
+    prompt = _STORY_SUB_RE.sub(substitute, prompt_template)
 
     request_body = {
         "contents": [{"parts": [{"text": prompt}]}],
@@ -431,73 +1133,45 @@ def generate_story_with_words(
         },
     }
 
-    headers = {
-        "Content-Type": "application/json",
-        "x-goog-api-key": api_key,
-    }
-
     try:
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(request_body).encode("utf-8"),
-            headers=headers,
+        result = _post_json(
+            f"{_MODELS_URL}/{model}:generateContent", api_key, request_body
         )
 
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode("utf-8"))
-
         # Parse response with error handling
         try:
             story = result["candidates"][0]["content"]["parts"][0]["text"]
 
             # Clean up the story - remove language detection lines if present
-            lines = story.split('\n')
-            cleaned_lines = []
-            skip_next = False
-
-            for line in lines:
-                # Skip language detection headers
-                if 'linguagem detectada' in line.lower() or 'detected language' in line.lower():
-                    skip_next = True
-                    continue
-                # Skip separator lines after detection
-                if skip_next and (line.strip() == '***' or line.strip() == '---' or line.strip() == ''):
-                    if line.strip() in ('***', '---'):
-                        skip_next = False
-                    continue
-                skip_next = False
-                cleaned_lines.append(line)
-
-            story = '\n'.join(cleaned_lines).strip()
-            return story
+            return _LANG_HEADER_RE.sub("", story).strip()
         except (KeyError, IndexError) as e:
             # Create detailed error message for user
             error_details = f"Parsing Error: {e!s}\n\n"
             error_details += "API Response Keys: " + str(list(result.keys())) + "\n\n"
 
             if "candidates" in result:
-                error_details += f"Candidates count: {len(result.get('candidates', []))}\n"
-                if result.get('candidates'):
-                    candidate = result['candidates'][0]
+                error_details += (
+                    f"Candidates count: {len(result.get('candidates', []))}\n"
+                )
+                if result.get("candidates"):
+                    candidate = result["candidates"][0]
                     error_details += f"Candidate keys: {list(candidate.keys())}\n"
-                    if 'content' in candidate:
-                        error_details += f"Content keys: {list(candidate['content'].keys())}\n"
-
-            # Also write to a log file for debugging
-            log_path = os.path.expanduser("~/Library/Application Support/Anki2/lexiforge_error.log")
-            with open(log_path, "a") as f:
-                f.write(f"\n=== {datetime.datetime.now()} ===\n")
-                f.write(error_details)
-                f.write("\nFull response:\n")
-                f.write(json.dumps(result, indent=2))
-                f.write("\n")
+                    if "content" in candidate:
+                        error_details += (
+                            f"Content keys: {list(candidate['content'].keys())}\n"
+                        )
+
+            # Also write to the error log for debugging
+            _error_log.error(
+                "%s\nFull response:\n%s", error_details, json.dumps(result, indent=2)
+            )
 
-            return f"❌ Parsing Error\n\n{error_details}\n\nFull log saved to:\n{log_path}"
+            return f"❌ Parsing Error\n\n{error_details}\n\nFull log saved to:\n{ERROR_LOG_PATH}"
 
     except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8")
-        logger.error(f"LexiForge Story HTTP Error {e.code}: {error_body}")
+        error_body = e.read().decode("utf-8", "replace")
+        logger.error("LexiForge Story HTTP Error %d: %s", e.code, error_body)
         return f"API Error: {e.code}\n\n{error_body}"
     except Exception as e:
-        logger.error(f"LexiForge Story Error: {e}")
+        logger.error("LexiForge Story Error: %s", e)
         return f"Error generating story: {e!s}"
@@ -0,0 +1,172 @@
+"""Batch generation for notes selected in the Browser."""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Any
+
+from aqt import mw
+from aqt.qt import QAction
+from aqt.utils import showInfo, tooltip
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from aqt.browser import Browser
+
+# Concurrent Gemini + TTS requests when batch_workers is not configured
+DEFAULT_BATCH_WORKERS = 8
+
+
+def setup_browser_menu(browser: "Browser") -> None:
+    """Add the batch action to the Browser's Notes menu."""
+    from . import ADDON_NAME
+
+    action = QAction(f"Generate with {ADDON_NAME}", browser)
+    action.triggered.connect(lambda: generate_for_selected(browser))
+    browser.form.menu_Notes.addAction(action)
+
+
+def generate_for_selected(browser: "Browser") -> None:
+    """
+    Generate content and audio for every note selected in the Browser.
+
+    Definitions are requested first, several words at a time with the
+    default prompt. Audio is then fetched on a bounded thread pool; all
+    changes are saved in a single undoable operation once every note has
+    finished.
+    """
+    from aqt.operations.note import update_notes
+
+    from . import (
+        _generate_content_and_audio,
+        _update_note_fields,
+        get_config,
+        get_field_mapping,
+    )
+    from .ai_client import DEFAULT_MODEL, generate_content_batch
+
+    nids = browser.selected_notes()
+    if not nids:
+        showInfo("Please select one or more notes.")
+        return
+
+    conf = get_config()
+    api_key = conf.get("api_key")
+    if not api_key or "YOUR_KEY" in api_key:
+        showInfo("Please configure your API Key in Tools -> LexiForge Settings")
+        return
+
+    source_lang = conf.get("source_lang", "English")
+    definition_lang = conf.get("definition_lang", "English")
+
+    # Load notes on the main thread; workers only see plain strings
+    jobs = []
+    for nid in nids:
+        note = mw.col.get_note(nid)
+        fields = note.keys()
+        word_field, def_field, ex_field = get_field_mapping(fields, conf)
+        if word_field not in fields:
+            continue
+        word = note[word_field]
+        if word:
+            jobs.append((note, word, (word_field, def_field, ex_field)))
+
+    if not jobs:
+        showInfo("None of the selected notes have a word to generate for.")
+        return
+
+    total = len(jobs)
+    workers = max(1, int(conf.get("batch_workers", DEFAULT_BATCH_WORKERS)))
+    mw.progress.start(max=total, label=f"Generating 0/{total}...", immediate=True)
+
+    def background_op() -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = [{} for _ in jobs]
+        # Notes sharing a word are generated once
+        by_word: dict[str, list[int]] = {}
+        for index, (_note, word, _fields) in enumerate(jobs):
+            by_word.setdefault(word, []).append(index)
+
+        done = 0
+
+        def record(word: str, result: dict[str, Any]) -> None:
+            nonlocal done
+            indices = by_word[word]
+            for index in indices:
+                results[index] = result
+            done += len(indices)
+            mw.taskman.run_on_main(
+                lambda done=done: mw.progress.update(
+                    label=f"Generating {done}/{total}...", value=done, max=total
+                )
+            )
+
+        # Definitions first, several words per request with the default
+        # prompt. The results go straight to the audio step below, so a word
+        # whose request failed is not asked for again.
+        words = list(by_word)
+        contents = generate_content_batch(
+            words,
+            source_lang,
+            api_key,
+            conf.get("model", DEFAULT_MODEL),
+            definition_lang,
+            conf.get("prompt_template", "") or None,
+            max_workers=workers,
+            cache_ttl=conf.get("cache_ttl_days", 30) * 86400,
+        )
+
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="lexiforge-batch"
+        ) as pool:
+            futures = {}
+            for word, content in zip(words, contents):
+                definition, example, _base_form = content
+                if not example:
+                    # An error message instead of a result; skip its audio
+                    record(word, {"error": definition})
+                    continue
+                future = pool.submit(
+                    _generate_content_and_audio,
+                    word,
+                    source_lang,
+                    definition_lang,
+                    conf,
+                    content,
+                )
+                futures[future] = word
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"error": str(e)}
+                record(futures[future], result)
+        return results
+
+    def on_done(future: "Future[list[dict[str, Any]]]") -> None:
+        mw.progress.finish()
+        try:
+            results = future.result()
+        except Exception as e:
+            showInfo(f"Error during generation: {e!s}")
+            return
+
+        changed = []
+        failed = 0
+        for (note, _word, fields), result in zip(jobs, results):
+            # Error responses come back without an example; leave those notes alone
+            if "error" in result or not result.get("examples"):
+                failed += 1
+                continue
+            _update_note_fields(note, result, *fields)
+            changed.append(note)
+
+        summary = f"Generated {len(changed)} of {total} notes."
+        if failed:
+            summary += f" {failed} failed."
+        if not changed:
+            showInfo(summary)
+            return
+        update_notes(parent=browser, notes=changed).success(
+            lambda _changes: tooltip(summary, parent=browser)
+        ).run_in_background()
+
+    mw.taskman.run_in_background(background_op, on_done)
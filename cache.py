@@ -0,0 +1,176 @@
+"""Two-tier cache for generated word content.
+
+Recent entries live in an in-memory LRU. Everything is also stored in a
+small SQLite database next to the add-on (WAL mode, so reads never wait
+for a write), which lets repeat words skip the Gemini round-trip across
+sessions.
+"""
+
+import contextlib
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+CACHE_FILENAME = "gen_cache.sqlite3"
+
+# Number of decoded entries kept in memory
+MEMORY_CAPACITY = 512
+
+# Entries older than this are treated as missing (seconds)
+DEFAULT_TTL = 30 * 24 * 60 * 60
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+# Shared connection, guarded by _lock; reopened if the cache path changes
+_conn: Optional[sqlite3.Connection] = None
+_conn_path: Optional[Path] = None
+
+
+def get_cache_path() -> Path:
+    """Get the absolute path to the cache database."""
+    return Path(__file__).parent / CACHE_FILENAME
+
+
+def make_key(*parts: Optional[str]) -> str:
+    """
+    Build a stable cache key from the given parts.
+
+    Args:
+        *parts: Values identifying the request. None is treated as "".
+
+    Returns:
+        Hex SHA-256 digest of the parts joined with "|".
+    """
+    joined = "|".join(part or "" for part in parts)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the database on first use. Must be called with _lock held."""
+    global _conn, _conn_path
+    path = get_cache_path()
+    if _conn is not None and _conn_path == path:
+        return _conn
+    if _conn is not None:
+        _conn.close()
+
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries"
+        " (key TEXT PRIMARY KEY, ts REAL NOT NULL, value TEXT NOT NULL)"
+    )
+    _conn, _conn_path = conn, path
+    return conn
+
+
+def _remember(key: str, stamp: float, value: Any) -> None:
+    """Insert into the in-memory LRU, evicting the oldest entry if full."""
+    _memory[key] = (stamp, value)
+    _memory.move_to_end(key)
+    if len(_memory) > MEMORY_CAPACITY:
+        _memory.popitem(last=False)
+
+
+def get(key: str, ttl: float = DEFAULT_TTL) -> Optional[Any]:
+    """
+    Look up a cached value.
+
+    Args:
+        key: Key produced by make_key().
+        ttl: Maximum age in seconds for the entry to count as a hit.
+
+    Returns:
+        The cached value, or None if missing or expired.
+    """
+    now = time.time()
+    with _lock:
+        hit = _memory.get(key)
+        if hit is not None:
+            stamp, value = hit
+            if now - stamp <= ttl:
+                _memory.move_to_end(key)
+                return value
+            del _memory[key]
+            return None
+
+        try:
+            row = (
+                _connect()
+                .execute("SELECT ts, value FROM entries WHERE key = ?", (key,))
+                .fetchone()
+            )
+            if row is None or now - row[0] > ttl:
+                return None
+            value = json.loads(row[1])
+        except (sqlite3.Error, ValueError):
+            return None
+        _remember(key, row[0], value)
+        return value
+
+
+def put(key: str, value: Any) -> None:
+    """
+    Store a JSON-serialisable value in both tiers.
+
+    Args:
+        key: Key produced by make_key().
+        value: Value to cache.
+    """
+    stamp = time.time()
+    encoded = json.dumps(value, ensure_ascii=False)
+    with _lock:
+        # A read-only add-on folder should not break generation
+        with contextlib.suppress(sqlite3.Error):
+            _connect().execute(
+                "INSERT OR REPLACE INTO entries (key, ts, value) VALUES (?, ?, ?)",
+                (key, stamp, encoded),
+            )
+        _remember(key, stamp, value)
+
+
+def purge(older_than: float = DEFAULT_TTL) -> int:
+    """
+    Delete entries older than the given age from both tiers.
+
+    Args:
+        older_than: Age in seconds.
+
+    Returns:
+        Number of rows removed from the database.
+    """
+    cutoff = time.time() - older_than
+    with _lock:
+        for key in [k for k, (stamp, _v) in _memory.items() if stamp < cutoff]:
+            del _memory[key]
+        try:
+            return (
+                _connect()
+                .execute("DELETE FROM entries WHERE ts < ?", (cutoff,))
+                .rowcount
+            )
+        except sqlite3.Error:
+            return 0
+
+
+def clear() -> None:
+    """Drop all cached entries from memory and disk."""
+    with _lock:
+        _memory.clear()
+        with contextlib.suppress(sqlite3.Error):
+            _connect().execute("DELETE FROM entries")
+
+
+def close() -> None:
+    """Close the database connection; it is reopened on next use."""
+    global _conn, _conn_path
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+        _conn, _conn_path = None, None
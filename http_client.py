@@ -0,0 +1,242 @@
+"""Keep-alive HTTPS transport shared by the API clients.
+
+urllib.request opens a new TCP + TLS connection for every call and asks the
+server to close it afterwards. The Gemini and TTS endpoints are hit several
+times per note, so this module keeps idle http.client connections per host
+and reuses them. urlopen() accepts the same arguments as
+urllib.request.urlopen() and raises the same urllib.error exceptions.
+"""
+
+import http.client
+import io
+import ssl
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections.abc import Iterator
+from typing import Any, Optional, Union
+
+# Idle connections kept per (scheme, host, port)
+MAX_IDLE_PER_HOST = 4
+MAX_REDIRECTS = 5
+
+_POOL: dict[tuple[str, str, int], list[http.client.HTTPConnection]] = {}
+_POOL_LOCK = threading.Lock()
+_SSL_CONTEXT = ssl.create_default_context()
+
+# Raised when a pooled connection was closed by the server while idle
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+def _acquire(
+    scheme: str, host: str, port: int, timeout: Optional[float]
+) -> tuple[http.client.HTTPConnection, bool]:
+    """Take an idle connection from the pool, or open a new one."""
+    with _POOL_LOCK:
+        idle = _POOL.get((scheme, host, port))
+        conn = idle.pop() if idle else None
+    if conn is not None:
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+    if scheme == "https":
+        return (
+            http.client.HTTPSConnection(
+                host, port, timeout=timeout, context=_SSL_CONTEXT
+            ),
+            False,
+        )
+    return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+
+def _release(
+    scheme: str, host: str, port: int, conn: http.client.HTTPConnection
+) -> None:
+    """Return a connection to the pool, closing it if the pool is full."""
+    with _POOL_LOCK:
+        idle = _POOL.setdefault((scheme, host, port), [])
+        if len(idle) < MAX_IDLE_PER_HOST:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+def close_all() -> None:
+    """Close every idle pooled connection."""
+    with _POOL_LOCK:
+        conns = [conn for idle in _POOL.values() for conn in idle]
+        _POOL.clear()
+    for conn in conns:
+        conn.close()
+
+
+class PooledResponse:
+    """
+    File-like HTTP response that hands its connection back to the pool.
+
+    The connection is reused only if the body was read to the end; otherwise
+    it is closed, since unread data would corrupt the next request.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        response: http.client.HTTPResponse,
+        conn: http.client.HTTPConnection,
+        pool_key: tuple[str, str, int],
+    ) -> None:
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self._response = response
+        self._conn: Optional[http.client.HTTPConnection] = conn
+        self._pool_key = pool_key
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        data = self._response.read(amt)
+        if self._response.isclosed():
+            self.close()
+        return data
+
+    def readline(self, limit: int = -1) -> bytes:
+        line = self._response.readline(limit)
+        if self._response.isclosed():
+            self.close()
+        return line
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self.readline, b"")
+
+    def getcode(self) -> int:
+        return self.status
+
+    def geturl(self) -> str:
+        return self.url
+
+    def info(self) -> http.client.HTTPMessage:
+        return self.headers
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if self._response.isclosed() and not self._response.will_close:
+            _release(*self._pool_key, conn)
+        else:
+            self._response.close()
+            conn.close()
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def _send(
+    method: str,
+    url: str,
+    body: Optional[bytes],
+    headers: dict[str, str],
+    timeout: Optional[float],
+) -> PooledResponse:
+    """Issue one request on a pooled connection, retrying once if it was stale."""
+    parts = urllib.parse.urlsplit(url)
+    scheme = parts.scheme
+    host = parts.hostname or ""
+    port = parts.port or (443 if scheme == "https" else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+
+    while True:
+        conn, reused = _acquire(scheme, host, port, timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+        except _STALE_ERRORS:
+            conn.close()
+            if reused:
+                continue
+            raise
+        except BaseException:
+            conn.close()
+            raise
+        return PooledResponse(url, response, conn, (scheme, host, port))
+
+
+def urlopen(
+    url: Union[str, urllib.request.Request],
+    data: Optional[bytes] = None,
+    timeout: Optional[float] = None,
+) -> PooledResponse:
+    """
+    Open a URL, reusing a kept-alive connection to the same host if possible.
+
+    Args:
+        url: URL string or urllib.request.Request.
+        data: Request body; overrides the Request's data when given.
+        timeout: Socket timeout in seconds; None blocks indefinitely.
+
+    Returns:
+        A file-like response usable as a context manager.
+
+    Raises:
+        urllib.error.HTTPError: For non-2xx responses.
+        urllib.error.URLError: For connection failures.
+    """
+    req = (
+        url if isinstance(url, urllib.request.Request) else urllib.request.Request(url)
+    )
+    if data is not None:
+        req.data = data
+
+    # Proxies are handled by urllib's opener chain; keep its behaviour for them
+    if req.type not in ("http", "https") or urllib.request.getproxies():
+        return urllib.request.urlopen(req, timeout=timeout)  # type: ignore[return-value]
+
+    method = req.get_method()
+    full_url = req.full_url
+    body = req.data
+    headers = {name.title(): value for name, value in req.header_items()}
+    if body is not None:
+        headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+
+    for _ in range(MAX_REDIRECTS + 1):
+        try:
+            response = _send(method, full_url, body, headers, timeout)
+        except urllib.error.URLError:
+            raise
+        except OSError as e:
+            raise urllib.error.URLError(e) from e
+
+        location = response.headers.get("Location")
+        if response.status in (301, 302, 303, 307, 308) and location:
+            response.read()
+            response.close()
+            full_url = urllib.parse.urljoin(full_url, location)
+            if response.status == 303 or (
+                response.status in (301, 302) and method == "POST"
+            ):
+                method, body = "GET", None
+                headers.pop("Content-Type", None)
+            continue
+
+        if not 200 <= response.status < 300:
+            # Buffer the error body so the connection can go back to the pool
+            error_body = io.BytesIO(response.read())
+            response.close()
+            raise urllib.error.HTTPError(
+                full_url, response.status, response.reason, response.headers, error_body
+            )
+        return response
+
+    raise urllib.error.URLError(f"Too many redirects: {req.full_url}")
@@ -27,8 +27,35 @@ SUPPORTED_LANGUAGES = {
     "Polish": "pl",
 }
 
-# Get sorted list of language names for UI dropdowns
-LANGUAGE_NAMES = sorted(SUPPORTED_LANGUAGES.keys())
+# Sorted language names for UI dropdowns, written out so nothing is sorted at
+# import; keep in sync with SUPPORTED_LANGUAGES (checked by the tests)
+LANGUAGE_NAMES = (
+    "Arabic",
+    "Bengali",
+    "English",
+    "French",
+    "German",
+    "Hindi",
+    "Indonesian",
+    "Italian",
+    "Japanese",
+    "Korean",
+    "Mandarin Chinese",
+    "Polish",
+    "Portuguese",
+    "Russian",
+    "Spanish",
+    "Tamil",
+    "Thai",
+    "Turkish",
+    "Urdu",
+    "Vietnamese",
+)
+
+# Case-insensitive fallback for names typed by hand in the config
+_CODES_BY_CASEFOLD = {
+    name.casefold(): code for name, code in SUPPORTED_LANGUAGES.items()
+}
 
 
 def get_lang_code(language_name: str) -> str:
@@ -36,9 +63,13 @@ def get_lang_code(language_name: str) -> str:
     Get the ISO language code for a given language name.
 
     Args:
-        language_name: Display name of the language (e.g., "English")
+        language_name: Display name of the language (e.g., "English"); case
+            is ignored
 
     Returns:
         ISO language code (e.g., "en"), defaults to "en" if not found
     """
-    return SUPPORTED_LANGUAGES.get(language_name, "en")
+    code = SUPPORTED_LANGUAGES.get(language_name)
+    if code is None:
+        code = _CODES_BY_CASEFOLD.get(language_name.casefold(), "en")
+    return code
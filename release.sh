@@ -42,7 +42,9 @@ RELEASE_FILES=(
     "__init__.py"
     "ai_client.py"
     "tts_client.py"
-    "config.py"
+    "http_client.py"
+    "cache.py"
+    "browser.py"
     "language_constants.py"
     "manifest.json"
     "lexiforge_icon.svg"
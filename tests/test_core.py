@@ -1,22 +1,27 @@
 """Unit tests for LexiForge core functionality."""
 
-import os
+import io
+import json
 import sys
+import tempfile
+import threading
 import unittest
-from unittest.mock import MagicMock
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock, patch
 
 # Add parent directory to path (go up from tests/ to python/ directory)
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-# Mock Anki modules before importing
-sys.modules["aqt"] = MagicMock()
-sys.modules["aqt.qt"] = MagicMock()
-sys.modules["aqt.utils"] = MagicMock()
-sys.modules["anki"] = MagicMock()
-sys.modules["anki.hooks"] = MagicMock()
+# Mock Anki modules before importing, reusing stubs another test module
+# already installed
+for _name in ("aqt", "aqt.qt", "aqt.utils", "anki", "anki.hooks"):
+    if _name not in sys.modules:
+        sys.modules[_name] = MagicMock()
 
-from lexiforge import ai_client
-from lexiforge import language_constants
+import lexiforge
+from lexiforge import ai_client, cache, language_constants
 
 
 class TestLanguageConstants(unittest.TestCase):
@@ -29,6 +34,11 @@ class TestLanguageConstants(unittest.TestCase):
         self.assertEqual(language_constants.get_lang_code("Mandarin Chinese"), "zh-CN")
         self.assertEqual(language_constants.get_lang_code("Portuguese"), "pt-BR")
 
+    def test_get_lang_code_ignores_case(self) -> None:
+        """Test names typed in another case still resolve."""
+        self.assertEqual(language_constants.get_lang_code("english"), "en")
+        self.assertEqual(language_constants.get_lang_code("MANDARIN CHINESE"), "zh-CN")
+
     def test_get_lang_code_unknown_language(self) -> None:
         """Test fallback for unknown languages."""
         self.assertEqual(language_constants.get_lang_code("Unknown"), "en")
@@ -71,6 +81,20 @@ EXAMPLE: She runs every morning."""
         self.assertEqual(definition, "")
         self.assertEqual(example, "")
 
+    def test_parse_response_empty_field(self) -> None:
+        """Test that an empty field does not swallow the next label."""
+        text = "BASE_FORM:\nDEFINITION: to move\nEXAMPLE: I ran."
+
+        self.assertEqual(ai_client.parse_response(text), ("to move", "I ran.", ""))
+
+    def test_parse_response_labels_on_one_line(self) -> None:
+        """Test parsing several labels written on the same line."""
+        text = "BASE_FORM: run DEFINITION: to move fast EXAMPLE: I run."
+
+        self.assertEqual(
+            ai_client.parse_response(text), ("to move fast", "I run.", "run")
+        )
+
 
 class TestPromptTemplates(unittest.TestCase):
     """Test prompt templates."""
@@ -91,6 +115,288 @@ class TestPromptTemplates(unittest.TestCase):
         self.assertIn("{{level}}", template)
         self.assertIn("{{word_count}}", template)
 
+    def test_story_language_header_is_stripped(self) -> None:
+        """Test that a detected-language header and its separator are removed."""
+        story = "Detected language: Spanish\n\n***\nHabía una vez\n\nFin."
+
+        cleaned = ai_client._LANG_HEADER_RE.sub("", story).strip()
+
+        self.assertEqual(cleaned, "Había una vez\n\nFin.")
+
+
+class TestGenerationCache(unittest.TestCase):
+    """Test the two-tier generation cache."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        path = Path(self.tmp.name) / cache.CACHE_FILENAME
+        self.path_patch = patch.object(cache, "get_cache_path", return_value=path)
+        self.path_patch.start()
+        cache.clear()
+
+    def tearDown(self) -> None:
+        cache.clear()
+        cache.close()
+        self.path_patch.stop()
+        self.tmp.cleanup()
+
+    def test_put_then_get(self) -> None:
+        """Test a stored value is returned for the same key."""
+        key = cache.make_key("model", "English", "English", None, "run")
+        cache.put(key, ["def", "example", "run"])
+        self.assertEqual(cache.get(key), ["def", "example", "run"])
+        self.assertIsNone(cache.get(cache.make_key("other")))
+
+    def test_disk_tier_survives_memory_reset(self) -> None:
+        """Test entries are read back from disk after memory is dropped."""
+        key = cache.make_key("word")
+        cache.put(key, ["a", "b", "c"])
+        cache.put(key, ["d", "e", "f"])
+        cache._memory.clear()
+        cache.close()
+        self.assertEqual(cache.get(key), ["d", "e", "f"])
+
+    @patch("lexiforge.ai_client.urlopen")
+    def test_generate_content_uses_cache(self, mock_urlopen: MagicMock) -> None:
+        """Test a repeated lookup with cache_ttl skips the API call."""
+        text = "BASE_FORM: run\nDEFINITION: to move fast\nEXAMPLE: I run."
+        payload = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(
+            json.dumps(payload).encode("utf-8")
+        )
+
+        on_miss = MagicMock()
+        first = ai_client.generate_content(
+            "run", "English", "key", cache_ttl=60, on_miss=on_miss
+        )
+        second = ai_client.generate_content(
+            "run", "English", "key", cache_ttl=60, on_miss=on_miss
+        )
+
+        self.assertEqual(first, ("to move fast", "I run.", "run"))
+        self.assertEqual(second, first)
+        mock_urlopen.assert_called_once()
+        # Only the lookup that reached the API reports a miss
+        on_miss.assert_called_once_with()
+
+    @patch("lexiforge.ai_client.urlopen")
+    def test_variants_hit_the_lemma_entry(self, mock_urlopen: MagicMock) -> None:
+        """Test case/punctuation variants and the base form reuse a result."""
+        text = "BASE_FORM: run\nDEFINITION: to move fast\nEXAMPLE: He ran."
+        payload = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(
+            json.dumps(payload).encode("utf-8")
+        )
+
+        first = ai_client.generate_content("ran", "English", "key", cache_ttl=60)
+        for variant in ("Ran.", " RAN ", "run"):
+            with self.subTest(variant=variant):
+                self.assertEqual(
+                    ai_client.generate_content(variant, "English", "key", cache_ttl=60),
+                    first,
+                )
+        mock_urlopen.assert_called_once()
+
+    def test_expired_entry_is_missing(self) -> None:
+        """Test entries older than the TTL are ignored."""
+        key = cache.make_key("word")
+        cache.put(key, ["a", "b", "c"])
+        self.assertIsNone(cache.get(key, ttl=-1))
+
+    def test_purge_removes_old_entries(self) -> None:
+        """Test purge drops entries older than the given age."""
+        key = cache.make_key("word")
+        cache.put(key, ["a", "b", "c"])
+        self.assertEqual(cache.purge(older_than=60), 0)
+        self.assertEqual(cache.purge(older_than=-1), 1)
+        self.assertIsNone(cache.get(key))
+
+
+class TestConfigWriter(unittest.TestCase):
+    """Test the background config writer."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / lexiforge.CONFIG_FILENAME
+        # The current thread stands in for the writer, so no thread is started
+        for name, value in (
+            ("_CONFIG_CACHE", None),
+            ("_CONFIG_MTIME", None),
+            ("_CONFIG_WRITER", threading.current_thread()),
+        ):
+            patcher = patch.object(lexiforge, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lexiforge._CONFIG_DIRTY.clear)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_failed_write_stays_pending(self) -> None:
+        """Test a failed write is logged and kept for the next flush."""
+        missing_dir = Path(self.tmp.name) / "missing" / lexiforge.CONFIG_FILENAME
+        lexiforge.save_config({"model": "m"})
+
+        with (
+            patch.object(lexiforge, "get_config_path", return_value=str(missing_dir)),
+            self.assertLogs("lexiforge", level="ERROR"),
+        ):
+            self.assertFalse(lexiforge.flush_config())
+        self.assertTrue(lexiforge._CONFIG_DIRTY.is_set())
+
+        with patch.object(lexiforge, "get_config_path", return_value=str(self.path)):
+            self.assertTrue(lexiforge.flush_config())
+            self.assertFalse(lexiforge._CONFIG_DIRTY.is_set())
+            self.assertEqual(json.loads(self.path.read_bytes()), {"model": "m"})
+            self.assertEqual(lexiforge.get_config()["model"], "m")
+
+    def test_legacy_default_prompt_is_read_as_default(self) -> None:
+        """Test the old default prompt saved verbatim counts as the default."""
+        legacy = ai_client._LEGACY_DEFAULT_PROMPT_TEMPLATE
+        self.path.write_text(json.dumps({"prompt_template": legacy + "\n"}))
+
+        with patch.object(lexiforge, "get_config_path", return_value=str(self.path)):
+            self.assertEqual(lexiforge.get_config()["prompt_template"], "")
+        self.assertFalse(ai_client.is_default_prompt_template("Word: {{word}}"))
+
+
+class TestStudiedWordCounts(unittest.TestCase):
+    """Test the per-deck counts shown in the story deck picker."""
+
+    def test_counts_cleaned_unique_words(self) -> None:
+        """Test counts match the cleaned, deduplicated word list."""
+        mw = MagicMock()
+        mw.col.sched.day_cutoff = 86400
+        mw.col.db.all.return_value = [
+            (1, "run\x1fto move fast"),
+            (1, "<b>run</b>\x1f[sound:run.mp3]"),
+            (1, "caf&eacute;\x1fcoffee shop"),
+            (2, "run\x1fto move fast"),
+            (2, "<br>\x1fempty word"),
+        ]
+
+        with patch.object(lexiforge, "mw", mw):
+            counts = lexiforge.get_studied_word_counts_by_deck()
+
+        self.assertEqual(counts, {None: 2, 1: 2, 2: 1})
+
+
+class TestSpeculativeAudio(unittest.TestCase):
+    """Test the audio download started before Gemini answers."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.media_dir = Path(self.tmp.name)
+        mw = MagicMock()
+        mw.col.media.dir.return_value = self.tmp.name
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown)
+        for patcher in (
+            patch.object(lexiforge, "mw", mw),
+            patch.object(lexiforge, "_audio_executor", return_value=self.executor),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fake_download(
+        self, text: str, lang: str, path: str, force: bool = False
+    ) -> bool:
+        Path(path).write_bytes(b"ID3audio")
+        return True
+
+    def test_cache_miss_uses_speculative_download(self) -> None:
+        """Test the audio fetched during a cache miss becomes the note audio."""
+
+        def generate(*args: Any, on_miss: Any = None, **kwargs: Any) -> Any:
+            on_miss()
+            return "to move fast", "I run.", "run"
+
+        with (
+            patch(
+                "lexiforge.tts_client.download_audio", side_effect=self.fake_download
+            ) as download,
+            patch("lexiforge.ai_client.generate_content", side_effect=generate),
+        ):
+            result = lexiforge._generate_content_and_audio(
+                "run", "English", "English", {"api_key": "key"}
+            )
+
+        download.assert_called_once()
+        self.assertEqual(
+            [path.name for path in self.media_dir.iterdir()], [result["audio_file"]]
+        )
+
+    def test_given_content_only_fetches_audio(self) -> None:
+        """Test batch results are used without asking Gemini again."""
+        with (
+            patch(
+                "lexiforge.tts_client.download_audio", side_effect=self.fake_download
+            ) as download,
+            patch("lexiforge.ai_client.generate_content") as generate,
+        ):
+            result = lexiforge._generate_content_and_audio(
+                "ran",
+                "English",
+                "English",
+                {"api_key": "key"},
+                ("to move fast", "I ran.", "run"),
+            )
+
+        generate.assert_not_called()
+        download.assert_called_once()
+        self.assertEqual(result["base_form"], "run")
+        self.assertIsNotNone(result["audio_file"])
+
+    def test_generation_error_removes_part_file(self) -> None:
+        """Test a failing generate_content leaves no .part file behind."""
+
+        def generate(*args: Any, on_miss: Any = None, **kwargs: Any) -> Any:
+            on_miss()
+            raise RuntimeError("boom")
+
+        with (
+            patch(
+                "lexiforge.tts_client.download_audio", side_effect=self.fake_download
+            ),
+            patch("lexiforge.ai_client.generate_content", side_effect=generate),
+            self.assertRaises(RuntimeError),
+        ):
+            lexiforge._generate_content_and_audio(
+                "run", "English", "English", {"api_key": "key"}
+            )
+
+        self.executor.shutdown(wait=True)
+        self.assertEqual(list(self.media_dir.iterdir()), [])
+
+
+class TestEditorGenerate(unittest.TestCase):
+    """Test the editor's Generate button."""
+
+    def test_overlapping_clicks_run_once(self) -> None:
+        """Test a second click while the first is running is ignored."""
+        mw = MagicMock()
+        editor = MagicMock()
+        editor.note.id = 1
+        editor.note.__getitem__.return_value = "run"
+        for patcher in (
+            patch.object(lexiforge, "mw", mw),
+            patch.object(lexiforge, "tooltip"),
+            patch.object(lexiforge, "get_config", return_value={"api_key": "key"}),
+            patch.object(lexiforge, "_validate_note_and_config", return_value=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lexiforge._EDITOR_JOBS.clear)
+
+        lexiforge.on_generate_click(editor)
+        lexiforge.on_generate_click(editor)
+        mw.taskman.run_in_background.assert_called_once()
+
+        # Once the first run has finished, the button works again
+        _background_op, on_success = mw.taskman.run_in_background.call_args[0]
+        on_success(MagicMock(**{"result.return_value": {"error": "boom"}}))
+        lexiforge.on_generate_click(editor)
+        self.assertEqual(mw.taskman.run_in_background.call_count, 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,12 +1,14 @@
+import io
 import json
-import os
 import sys
 import unittest
+import urllib.error
+from email.message import Message
+from pathlib import Path
+from typing import Any, Optional
 from unittest.mock import MagicMock, patch
 
-sys.path.append(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
+sys.path.append(str(Path(__file__).resolve().parents[2]))
 
 from lexiforge import ai_client
 
@@ -22,11 +24,12 @@ class TestGeminiSimple(unittest.TestCase):
             ("English", "hello", "French", "bonjour"),
         ]
 
-    @patch("lexiforge.ai_client.urllib.request.urlopen")
-    def test_generate_content_with_mocked_responses(self, mock_urlopen) -> None:
+    @patch("lexiforge.ai_client.urlopen")
+    def test_generate_content_with_mocked_responses(
+        self, mock_urlopen: MagicMock
+    ) -> None:
         for source, word, target, definition in self.test_cases:
             with self.subTest(source=source, word=word, target=target):
-                mock_response = MagicMock()
                 payload = {
                     "candidates": [
                         {
@@ -40,10 +43,10 @@ class TestGeminiSimple(unittest.TestCase):
                         }
                     ]
                 }
-                mock_response.read.return_value = json.dumps(payload).encode("utf-8")
-                mock_response.__enter__.return_value = mock_response
-                mock_response.__exit__.return_value = None
-                mock_urlopen.return_value = mock_response
+                body = json.dumps(payload).encode("utf-8")
+                mock_urlopen.side_effect = lambda *args, body=body, **kwargs: (
+                    io.BytesIO(body)
+                )
 
                 result_definition, example, base_form = ai_client.generate_content(
                     word, source, "fake_api", definition_lang=target
@@ -53,6 +56,212 @@ class TestGeminiSimple(unittest.TestCase):
                 self.assertEqual(result_definition, definition)
                 self.assertIn(word, example)
 
+    @patch("lexiforge.ai_client.urlopen")
+    def test_generate_content_batch_keeps_word_order(
+        self, mock_urlopen: MagicMock
+    ) -> None:
+        def respond(req: Any, timeout: Optional[float] = None) -> io.BytesIO:
+            prompt = json.loads(req.data)["contents"][0]["parts"][0]["text"]
+            word = prompt.rsplit("Word: ", 1)[1]
+            text = f"BASE_FORM: {word}\nDEFINITION: def {word}\nEXAMPLE: Using {word}."
+            payload = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+            return io.BytesIO(json.dumps(payload).encode("utf-8"))
+
+        mock_urlopen.side_effect = respond
+        words = ["uno", "dos", "tres", "cuatro"]
+        # Custom templates are sent one word per request
+        results = ai_client.generate_content_batch(
+            words, "Spanish", "fake_api", prompt_template="Word: {{word}}"
+        )
+
+        self.assertEqual([base_form for _d, _e, base_form in results], words)
+        self.assertEqual(mock_urlopen.call_count, len(words))
+
+    @patch("lexiforge.ai_client.urlopen")
+    def test_custom_template_keeps_json_answer(self, mock_urlopen: MagicMock) -> None:
+        answer = '{"base_form": "gato", "definition": "cat", "example": "Un gato."}'
+        payload = {"candidates": [{"content": {"parts": [{"text": answer}]}}]}
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(
+            json.dumps(payload).encode("utf-8")
+        )
+
+        result = ai_client.generate_content(
+            "gato", "Spanish", "fake_api", prompt_template="Explain: {{word}}"
+        )
+
+        self.assertEqual(result, ("cat", "Un gato.", "gato"))
+        body = json.loads(mock_urlopen.call_args[0][0].data)
+        prompt = body["contents"][0]["parts"][0]["text"]
+        # The format comes from the code, so the word still goes last
+        self.assertTrue(prompt.endswith("Explain: gato"))
+        self.assertIn("JSON", prompt)
+        self.assertEqual(
+            body["generationConfig"]["responseMimeType"], "application/json"
+        )
+
+    @patch("lexiforge.ai_client.urlopen")
+    def test_generate_content_batch_shares_one_request(
+        self, mock_urlopen: MagicMock
+    ) -> None:
+        words = ["uno", "dos", "tres", "cuatro"]
+        # Answers come back out of order and matched by the echoed word;
+        # "dos" is incomplete and "cuatro" missing, so both are retried alone
+        batch = [
+            {
+                "word": "Tres",
+                "base_form": "tres",
+                "definition": "three",
+                "example": "Tengo tres.",
+            },
+            {"word": "dos", "base_form": "dos", "definition": "", "example": ""},
+            {
+                "word": "uno",
+                "base_form": "uno",
+                "definition": "one",
+                "example": "Tengo uno.",
+            },
+        ]
+        singles = {
+            "dos": "BASE_FORM: dos\nDEFINITION: two\nEXAMPLE: Tengo dos.",
+            "cuatro": "BASE_FORM: cuatro\nDEFINITION: four\nEXAMPLE: Tengo cuatro.",
+        }
+
+        def respond(req: Any, timeout: Optional[float] = None) -> io.BytesIO:
+            body = json.loads(req.data)
+            prompt = body["contents"][0]["parts"][0]["text"]
+            schema = body["generationConfig"]["responseSchema"]
+            if schema["type"] == "ARRAY":
+                self.assertIn("word", schema["items"]["required"])
+                text = json.dumps(batch)
+            else:
+                text = singles[prompt.rsplit("Word: ", 1)[1]]
+            self.assertNotIn("BASE_FORM:", prompt)
+            payload = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+            return io.BytesIO(json.dumps(payload).encode("utf-8"))
+
+        mock_urlopen.side_effect = respond
+        results = ai_client.generate_content_batch(words, "Spanish", "fake_api")
+
+        self.assertEqual(
+            results,
+            [
+                ("one", "Tengo uno.", "uno"),
+                ("two", "Tengo dos.", "dos"),
+                ("three", "Tengo tres.", "tres"),
+                ("four", "Tengo cuatro.", "cuatro"),
+            ],
+        )
+        self.assertEqual(mock_urlopen.call_count, 3)
+
+    @patch("lexiforge.ai_client.urlopen")
+    def test_generate_content_reports_malformed_response(
+        self, mock_urlopen: MagicMock
+    ) -> None:
+        for payload in ({}, {"candidates": []}, {"candidates": [{"content": None}]}):
+            with self.subTest(payload=payload):
+                mock_urlopen.side_effect = lambda *args, p=payload, **kwargs: (
+                    io.BytesIO(json.dumps(p).encode("utf-8"))
+                )
+                definition, example, base_form = ai_client.generate_content(
+                    "hablar", "Spanish", "fake_api"
+                )
+                self.assertEqual(definition, "Error parsing AI response")
+                self.assertEqual(example, "")
+                self.assertEqual(base_form, "hablar")
+
+    @patch("lexiforge.ai_client.time.sleep")
+    @patch("lexiforge.ai_client.urlopen")
+    def test_generate_content_retries_rate_limit(
+        self, mock_urlopen: MagicMock, mock_sleep: MagicMock
+    ) -> None:
+        text = "BASE_FORM: hablar\nDEFINITION: to speak\nEXAMPLE: Quiero hablar."
+        payload = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+        busy = urllib.error.HTTPError(
+            "url", 429, "Too Many Requests", Message(), io.BytesIO(b"{}")
+        )
+        busy.headers["Retry-After"] = "2"
+        mock_urlopen.side_effect = [
+            busy,
+            io.BytesIO(json.dumps(payload).encode("utf-8")),
+        ]
+
+        result = ai_client.generate_content("hablar", "Spanish", "fake_api")
+
+        self.assertEqual(result, ("to speak", "Quiero hablar.", "hablar"))
+        mock_sleep.assert_called_once_with(2.0)
+
+    @patch("lexiforge.ai_client.urlopen")
+    def test_missing_model_fails_fast_until_cleared(
+        self, mock_urlopen: MagicMock
+    ) -> None:
+        def respond(req: Any, timeout: Optional[float] = None) -> io.BytesIO:
+            if req.full_url.endswith("/models"):
+                return io.BytesIO(b'{"models": [{"name": "models/gemini-x"}]}')
+            raise urllib.error.HTTPError(
+                req.full_url, 404, "Not Found", Message(), io.BytesIO(b"{}")
+            )
+
+        mock_urlopen.side_effect = respond
+        self.addCleanup(ai_client.clear_bad_models)
+        for _ in range(2):
+            definition, _example, _base = ai_client.generate_content(
+                "hablar", "Spanish", "key-404", model="no-such-model"
+            )
+            self.assertEqual(definition, "API Error: 404")
+        # One generate request plus one list_models call; the retry is skipped
+        self.assertEqual(mock_urlopen.call_count, 2)
+
+        ai_client.clear_bad_models()
+        ai_client.generate_content(
+            "hablar", "Spanish", "key-404", model="no-such-model"
+        )
+        # list_models is remembered, so only the generate request is repeated
+        self.assertEqual(mock_urlopen.call_count, 3)
+
+    def test_parse_response_reads_json_answers(self) -> None:
+        answer = (
+            '{"base_form": "hablar", "definition": "to speak", "example": "Hablo."}'
+        )
+        for text in (answer, f"```json\n{answer}\n```"):
+            with self.subTest(text=text):
+                self.assertEqual(
+                    ai_client.parse_response(text), ("to speak", "Hablo.", "hablar")
+                )
+
+    @patch("lexiforge.ai_client.urlopen")
+    def test_generate_content_streams_fields(self, mock_urlopen: MagicMock) -> None:
+        deltas = ["BASE_FORM: hab", "lar\nDEFINITION: to speak\nEXA", "MPLE: Hablo."]
+        events = b"".join(
+            b"data: "
+            + json.dumps(
+                {"candidates": [{"content": {"parts": [{"text": d}]}}]}
+            ).encode()
+            + b"\r\n\r\n"
+            for d in deltas
+        )
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(events)
+        fields: list[tuple[str, str]] = []
+
+        result = ai_client.generate_content(
+            "hablar",
+            "Spanish",
+            "fake_api",
+            on_field=lambda *field: fields.append(field),
+        )
+
+        self.assertEqual(result, ("to speak", "Hablo.", "hablar"))
+        self.assertEqual(
+            fields,
+            [
+                ("base_form", "hablar"),
+                ("definition", "to speak"),
+                ("example", "Hablo."),
+            ],
+        )
+        self.assertIn(
+            ":streamGenerateContent?alt=sse", mock_urlopen.call_args[0][0].full_url
+        )
+
     def test_parse_response_handles_missing_fields(self) -> None:
         text = "BASE_FORM: test"
         definition, example, base_form = ai_client.parse_response(text)
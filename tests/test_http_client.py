@@ -0,0 +1,113 @@
+import sys
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+# Mock Anki modules before importing, reusing stubs another test module
+# already installed
+for _name in ("aqt", "aqt.qt", "aqt.utils", "anki", "anki.hooks"):
+    if _name not in sys.modules:
+        sys.modules[_name] = MagicMock()
+
+from lexiforge import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so connections are kept alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes, **headers: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self.server.peers.append(self.client_address)
+        if self.path == "/ok":
+            self._send(200, b"ok")
+        elif self.path == "/drop":
+            # Answer as if the connection stays open, then close it, like a
+            # server timing out an idle keep-alive connection
+            self._send(200, b"dropped")
+            self.close_connection = True
+        elif self.path == "/redirect":
+            self._send(302, b"", Location="/ok")
+        else:
+            self._send(404, b'{"error": "missing"}')
+
+
+class TestHttpClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.peers = []
+        cls.port = cls.server.server_address[1]
+        cls.base = f"http://127.0.0.1:{cls.port}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        self.server.peers.clear()
+        # A proxy from the environment would route around the pool
+        patcher = patch.object(urllib.request, "getproxies", return_value={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(http_client.close_all)
+
+    def get(self, path: str) -> bytes:
+        with http_client.urlopen(f"{self.base}{path}", timeout=5) as response:
+            return response.read()
+
+    def test_connection_is_reused_after_body_is_read(self) -> None:
+        self.assertEqual(self.get("/ok"), b"ok")
+        self.assertEqual(len(http_client._POOL[("http", "127.0.0.1", self.port)]), 1)
+        self.assertEqual(self.get("/ok"), b"ok")
+
+        first, second = self.server.peers
+        self.assertEqual(first, second)
+
+    def test_stale_connection_is_retried(self) -> None:
+        self.assertEqual(self.get("/drop"), b"dropped")
+        # The pooled connection was closed by the server; the retry opens
+        # a new one transparently
+        self.assertEqual(self.get("/ok"), b"ok")
+
+        first, second = self.server.peers
+        self.assertNotEqual(first, second)
+
+    def test_redirect_is_followed(self) -> None:
+        with http_client.urlopen(f"{self.base}/redirect", timeout=5) as response:
+            self.assertEqual(response.read(), b"ok")
+            self.assertEqual(response.geturl(), f"{self.base}/ok")
+
+    def test_error_status_raises_http_error_with_body(self) -> None:
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self.get("/missing")
+
+        self.assertEqual(ctx.exception.code, 404)
+        self.assertEqual(ctx.exception.read(), b'{"error": "missing"}')
+        # The buffered error body lets the connection go back to the pool
+        self.assertEqual(self.get("/ok"), b"ok")
+        first, second = self.server.peers
+        self.assertEqual(first, second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,50 +1,56 @@
+import io
 import json
-import os
 import sys
+import tempfile
 import unittest
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-sys.path.append(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
+sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-sys.modules["aqt"] = MagicMock()
-sys.modules["aqt.qt"] = MagicMock()
-sys.modules["aqt.utils"] = MagicMock()
-sys.modules["anki"] = MagicMock()
-sys.modules["anki.hooks"] = MagicMock()
+# Reuse the stubs if another test module already installed them
+for _name in ("aqt", "aqt.qt", "aqt.utils", "anki", "anki.hooks"):
+    if _name not in sys.modules:
+        sys.modules[_name] = MagicMock()
 
 from lexiforge import ai_client, language_constants, tts_client
 
 
 class TestLanguageSupport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.tmpdir = Path(cls._tmp.name)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._tmp.cleanup()
+
     def test_all_languages_have_codes(self) -> None:
-        missing = [
-            lang
-            for lang in language_constants.LANGUAGE_NAMES
-            if not language_constants.get_lang_code(lang)
-        ]
-        self.assertListEqual(missing, [])
+        names = language_constants.LANGUAGE_NAMES
+        codes = list(map(language_constants.get_lang_code, names))
+        if not all(codes):
+            missing = [name for name, code in zip(names, codes) if not code]
+            self.fail(f"Missing codes for: {missing}")
+
+    def test_language_names_match_supported_languages(self) -> None:
+        self.assertEqual(
+            language_constants.LANGUAGE_NAMES,
+            tuple(sorted(language_constants.SUPPORTED_LANGUAGES)),
+        )
 
-    @patch("lexiforge.tts_client.urllib.request.urlopen")
-    def test_tts_download_mocked(self, mock_urlopen) -> None:
-        mock_response = MagicMock()
-        mock_response.read.return_value = b"audio"
-        mock_response.__enter__.return_value = mock_response
-        mock_response.__exit__.return_value = None
-        mock_urlopen.return_value = mock_response
+    @patch("lexiforge.tts_client.urlopen")
+    def test_tts_download_mocked(self, mock_urlopen: MagicMock) -> None:
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(b"ID3audio")
 
         for language in language_constants.LANGUAGE_NAMES[:5]:
             with self.subTest(language=language):
-                output_path = f"test_{language}.mp3"
+                output_path = str(self.tmpdir / f"{language}.mp3")
                 success = tts_client.download_audio("hello", language, output_path)
                 self.assertTrue(success)
-                if os.path.exists(output_path):
-                    os.remove(output_path)
 
-    @patch("lexiforge.ai_client.urllib.request.urlopen")
-    def test_ai_generation_mocked(self, mock_urlopen) -> None:
-        mock_response = MagicMock()
+    @patch("lexiforge.ai_client.urlopen")
+    def test_ai_generation_mocked(self, mock_urlopen: MagicMock) -> None:
         payload = {
             "candidates": [
                 {
@@ -58,10 +64,8 @@ class TestLanguageSupport(unittest.TestCase):
                 }
             ]
         }
-        mock_response.read.return_value = json.dumps(payload).encode("utf-8")
-        mock_response.__enter__.return_value = mock_response
-        mock_response.__exit__.return_value = None
-        mock_urlopen.return_value = mock_response
+        body = json.dumps(payload).encode("utf-8")
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(body)
 
         definition, example, base_form = ai_client.generate_content(
             "hola", "Spanish", "fake", definition_lang="English"
@@ -1,25 +1,41 @@
-import os
+import io
+import re
 import sys
+import tempfile
 import unittest
+from pathlib import Path
 
 # Add the parent directory to sys.path to import the module
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from unittest.mock import MagicMock, patch
-sys.modules["aqt"] = MagicMock()
-sys.modules["aqt.qt"] = MagicMock()
-sys.modules["anki"] = MagicMock()
-sys.modules["anki.hooks"] = MagicMock()
+
+# Reuse the stubs if another test module already installed them
+for _name in ("aqt", "aqt.qt", "anki", "anki.hooks"):
+    if _name not in sys.modules:
+        sys.modules[_name] = MagicMock()
 
 from lexiforge import ai_client, tts_client
 
+# Script-range checks use a compiled character class (e.g. Devanagari
+# [\u0900-\u097F], Arabic [\u0600-\u06FF]) rather than a per-char loop
+_CYRILLIC = re.compile(r"[\u0400-\u04FF]")
+
 
 class TestLexiForge(unittest.TestCase):
-    @patch('lexiforge.ai_client.urllib.request.urlopen')
-    def test_generate_content_spanish_to_english(self, mock_urlopen) -> None:
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.tmpdir = Path(cls._tmp.name)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._tmp.cleanup()
+
+    @patch("lexiforge.ai_client.urlopen")
+    def test_generate_content_spanish_to_english(self, mock_urlopen: MagicMock) -> None:
         # Mock API response
-        mock_response = MagicMock()
-        mock_response.read.return_value = b'''{
+        body = b"""{
             "candidates": [{
                 "content": {
                     "parts": [{
@@ -27,10 +43,8 @@ class TestLexiForge(unittest.TestCase):
                     }]
                 }
             }]
-        }'''
-        mock_response.__enter__.return_value = mock_response
-        mock_response.__exit__.return_value = None
-        mock_urlopen.return_value = mock_response
+        }"""
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(body)
 
         word = "gato"
         source_lang = "Spanish"
@@ -45,11 +59,10 @@ class TestLexiForge(unittest.TestCase):
         self.assertEqual(definition, "cat")
         self.assertIn("gato", example.lower())
 
-    @patch('lexiforge.ai_client.urllib.request.urlopen')
-    def test_generate_content_english_to_russian(self, mock_urlopen) -> None:
+    @patch("lexiforge.ai_client.urlopen")
+    def test_generate_content_english_to_russian(self, mock_urlopen: MagicMock) -> None:
         # Mock API response
-        mock_response = MagicMock()
-        mock_response.read.return_value = b'''{
+        body = b"""{
             "candidates": [{
                 "content": {
                     "parts": [{
@@ -57,10 +70,8 @@ class TestLexiForge(unittest.TestCase):
                     }]
                 }
             }]
-        }'''
-        mock_response.__enter__.return_value = mock_response
-        mock_response.__exit__.return_value = None
-        mock_urlopen.return_value = mock_response
+        }"""
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(body)
 
         word = "ran"
         source_lang = "English"
@@ -72,20 +83,16 @@ class TestLexiForge(unittest.TestCase):
 
         self.assertEqual(base_form, "run")
         # Check for Cyrillic characters in definition
-        self.assertTrue(
-            any("\u0400" <= c <= "\u04ff" for c in definition),
+        self.assertIsNotNone(
+            _CYRILLIC.search(definition),
             "Definition should contain Cyrillic characters",
         )
         self.assertIn("ran", example.lower())
 
-    @patch('lexiforge.tts_client.urllib.request.urlopen')
-    def test_audio_generation(self, mock_urlopen) -> None:
+    @patch("lexiforge.tts_client.urlopen")
+    def test_audio_generation(self, mock_urlopen: MagicMock) -> None:
         # Mock TTS download
-        mock_response = MagicMock()
-        mock_response.read.return_value = b"audio-bytes"
-        mock_response.__enter__.return_value = mock_response
-        mock_response.__exit__.return_value = None
-        mock_urlopen.return_value = mock_response
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(b"ID3audio-bytes")
 
         word = "test"
         source_lang = "English"
@@ -94,12 +101,10 @@ class TestLexiForge(unittest.TestCase):
         self.assertEqual(lang_code, "en")
 
         # Test audio download with mock
-        output_path = "test_audio.mp3"
+        output_path = str(self.tmpdir / "audio.mp3")
         success = tts_client.download_audio(word, source_lang, output_path)
         self.assertTrue(success, "Audio download should succeed")
         mock_urlopen.assert_called_once()
-        if os.path.exists(output_path):
-            os.remove(output_path)
 
 
 if __name__ == "__main__":
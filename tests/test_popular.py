@@ -1,61 +1,113 @@
-import os
+import io
+import json
 import sys
+import tempfile
 import unittest
+from pathlib import Path
 
 # Add the parent directory of the project to sys.path
-sys.path.append(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
+sys.path.append(str(Path(__file__).resolve().parents[2]))
 
 from unittest.mock import MagicMock, patch
 
-# Mock Anki modules before importing lexiforge
-sys.modules["aqt"] = MagicMock()
-sys.modules["aqt.qt"] = MagicMock()
-sys.modules["aqt.utils"] = MagicMock()
-sys.modules["anki"] = MagicMock()
-sys.modules["anki.hooks"] = MagicMock()
+# Mock Anki modules before importing, reusing stubs another test module
+# already installed
+for _name in ("aqt", "aqt.qt", "aqt.utils", "anki", "anki.hooks"):
+    if _name not in sys.modules:
+        sys.modules[_name] = MagicMock()
 
 from lexiforge import ai_client, tts_client
 
 
 class TestLexiForgePopular(unittest.TestCase):
-    def setUp(self) -> None:
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.tmpdir = Path(cls._tmp.name)
         # Test cases: (Source, Definition Lang, Word, Expected Base, Expected Definition, Expected Example)
-        self.test_cases = [
-            ("Spanish", "English", "comiendo", "comer", "to eat", "Estoy comiendo una manzana."),
+        cls.test_cases = [
+            (
+                "Spanish",
+                "English",
+                "comiendo",
+                "comer",
+                "to eat",
+                "Estoy comiendo una manzana.",
+            ),
             ("French", "English", "allé", "aller", "to go", "Je suis allé au marché."),
-            ("German", "English", "gegangen", "gehen", "to go", "Ich bin nach Hause gegangen."),
-            ("Italian", "English", "mangiato", "mangiare", "to eat", "Ho mangiato la pizza."),
-            ("Portuguese", "English", "falando", "falar", "to speak", "Estou falando português."),
+            (
+                "German",
+                "English",
+                "gegangen",
+                "gehen",
+                "to go",
+                "Ich bin nach Hause gegangen.",
+            ),
+            (
+                "Italian",
+                "English",
+                "mangiato",
+                "mangiare",
+                "to eat",
+                "Ho mangiato la pizza.",
+            ),
+            (
+                "Portuguese",
+                "English",
+                "falando",
+                "falar",
+                "to speak",
+                "Estou falando português.",
+            ),
         ]
+        # Mocked Gemini response body for each word, built once for all subtests
+        cls.payloads = {
+            word: json.dumps(
+                {
+                    "candidates": [
+                        {
+                            "content": {
+                                "parts": [
+                                    {
+                                        "text": f"BASE_FORM: {base}\nDEFINITION: {definition}\nEXAMPLE: {example}"
+                                    }
+                                ]
+                            }
+                        }
+                    ]
+                }
+            ).encode("utf-8")
+            for _source, _lang, word, base, definition, example in cls.test_cases
+        }
 
-    @patch('lexiforge.ai_client.urllib.request.urlopen')
-    @patch('lexiforge.tts_client.urllib.request.urlopen')
-    def test_popular_languages(self, mock_tts_urlopen, mock_urlopen) -> None:
-        for source, definition_lang, word, expected_base, expected_def, expected_ex in self.test_cases:
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._tmp.cleanup()
+
+    @patch("lexiforge.ai_client.urlopen")
+    @patch("lexiforge.tts_client.urlopen")
+    def test_popular_languages(
+        self, mock_tts_urlopen: MagicMock, mock_urlopen: MagicMock
+    ) -> None:
+        # Mock TTS download
+        mock_tts_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(
+            b"ID3fake-bytes"
+        )
+
+        for (
+            source,
+            definition_lang,
+            word,
+            expected_base,
+            expected_def,
+            expected_ex,
+        ) in self.test_cases:
             with self.subTest(source=source, word=word):
                 # Mock AI response
-                mock_response = MagicMock()
-                mock_response.read.return_value = f'''{{
-                    "candidates": [{{
-                        "content": {{
-                            "parts": [{{
-                                "text": "BASE_FORM: {expected_base}\\nDEFINITION: {expected_def}\\nEXAMPLE: {expected_ex}"
-                            }}]
-                        }}
-                    }}]
-                }}'''.encode('utf-8')
-                mock_response.__enter__.return_value = mock_response
-                mock_response.__exit__.return_value = None
-                mock_urlopen.return_value = mock_response
-
-                # Mock TTS download
-                tts_response = MagicMock()
-                tts_response.read.return_value = b"fake-bytes"
-                tts_response.__enter__.return_value = tts_response
-                tts_response.__exit__.return_value = None
-                mock_tts_urlopen.return_value = tts_response
+                body = self.payloads[word]
+                mock_urlopen.side_effect = lambda *args, body=body, **kwargs: (
+                    io.BytesIO(body)
+                )
 
                 definition, example, base_form = ai_client.generate_content(
                     word, source, "fake_api_key", "gemini-flash-latest", definition_lang
@@ -65,17 +117,16 @@ class TestLexiForgePopular(unittest.TestCase):
                 self.assertEqual(base_form, expected_base)
                 self.assertEqual(definition, expected_def)
                 self.assertEqual(example, expected_ex)
+                self.assertGreater(len(example), 5)
 
                 # Test TTS client
                 lang_code = tts_client.get_lang_code(source)
                 self.assertIsNotNone(lang_code)
 
                 # Test audio download (mocked)
-                output_path = "test.mp3"
+                output_path = str(self.tmpdir / f"{source}.mp3")
                 success = tts_client.download_audio(base_form, source, output_path)
                 self.assertTrue(success)
-                if os.path.exists(output_path):
-                    os.remove(output_path)
 
 
 if __name__ == "__main__":
@@ -1,37 +1,103 @@
-import os
+import io
 import sys
+import tempfile
 import unittest
+import urllib.error
+from email.message import Message
+from pathlib import Path
+from typing import Any
 from unittest.mock import MagicMock, patch
 
-sys.path.append(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
+sys.path.append(str(Path(__file__).resolve().parents[2]))
 
 from lexiforge import language_constants, tts_client
 
 
 class TestTTSSimple(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.tmpdir = Path(cls._tmp.name)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._tmp.cleanup()
+
     def test_supported_languages_subset(self) -> None:
         for language in language_constants.LANGUAGE_NAMES:
             code = language_constants.get_lang_code(language)
             self.assertTrue(code)
 
-    @patch("lexiforge.tts_client.urllib.request.urlopen")
-    def test_download_audio_mocked(self, mock_urlopen) -> None:
-        mock_response = MagicMock()
-        mock_response.read.return_value = b"audio"
-        mock_response.__enter__.return_value = mock_response
-        mock_response.__exit__.return_value = None
-        mock_urlopen.return_value = mock_response
+    @patch("lexiforge.tts_client.urlopen")
+    def test_download_audio_mocked(self, mock_urlopen: MagicMock) -> None:
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(b"ID3audio")
 
         languages = language_constants.LANGUAGE_NAMES[:3]
         for language in languages:
             with self.subTest(language=language):
-                path = f"test_{language}.mp3"
-                success = tts_client.download_audio("sample", language, path)
+                path = self.tmpdir / f"{language}.mp3"
+                success = tts_client.download_audio("sample", language, str(path))
                 self.assertTrue(success)
-                self.assertTrue(os.path.exists(path))
-                os.remove(path)
+                self.assertTrue(path.exists())
+
+    @patch("lexiforge.tts_client.urlopen")
+    def test_download_audio_skips_existing_file(self, mock_urlopen: MagicMock) -> None:
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(b"ID3new")
+        path = self.tmpdir / "existing.mp3"
+        path.write_bytes(b"old")
+
+        self.assertTrue(tts_client.download_audio("sample", "English", str(path)))
+        mock_urlopen.assert_not_called()
+
+        self.assertTrue(
+            tts_client.download_audio("sample", "English", str(path), force=True)
+        )
+        self.assertEqual(path.read_bytes(), b"ID3new")
+
+    @patch("lexiforge.tts_client.urlopen")
+    def test_download_audio_discards_interrupted_download(
+        self, mock_urlopen: MagicMock
+    ) -> None:
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(b"ID3audio")
+        path = self.tmpdir / "interrupted.mp3"
+
+        def copy_then_fail(src: Any, dst: Any, length: int = 0) -> None:
+            dst.write(src.read(2))
+            raise OSError("connection reset")
+
+        with patch("lexiforge.tts_client.shutil.copyfileobj", copy_then_fail):
+            self.assertFalse(tts_client.download_audio("sample", "English", str(path)))
+        # Neither the truncated clip nor its temporary file is left behind
+        self.assertEqual(list(self.tmpdir.glob("interrupted.mp3*")), [])
+
+        self.assertTrue(tts_client.download_audio("sample", "English", str(path)))
+        self.assertEqual(mock_urlopen.call_count, 2)
+        self.assertEqual(path.read_bytes(), b"ID3audio")
+
+    @patch("lexiforge.tts_client.urlopen")
+    def test_download_audio_rejects_non_mp3(self, mock_urlopen: MagicMock) -> None:
+        mock_urlopen.side_effect = lambda *args, **kwargs: io.BytesIO(
+            b"<html>Too many requests</html>"
+        )
+        path = self.tmpdir / "html.mp3"
+
+        self.assertFalse(tts_client.download_audio("sample", "English", str(path)))
+        self.assertFalse(path.exists())
+
+    @patch("lexiforge.tts_client.time.sleep")
+    @patch("lexiforge.tts_client.urlopen")
+    def test_download_audio_retries_server_error(
+        self, mock_urlopen: MagicMock, mock_sleep: MagicMock
+    ) -> None:
+        error = urllib.error.HTTPError(
+            "url", 503, "Service Unavailable", Message(), io.BytesIO(b"")
+        )
+        mock_urlopen.side_effect = [error, io.BytesIO(b"ID3audio")]
+
+        path = self.tmpdir / "retry.mp3"
+        self.assertTrue(tts_client.download_audio("sample", "English", str(path)))
+        self.assertEqual(mock_urlopen.call_count, 2)
+        mock_sleep.assert_called_once()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,67 @@
+import logging
+import shutil
+import threading
+import time
+import urllib.error
 import urllib.parse
 import urllib.request
+from pathlib import Path
+from typing import Any
 
 try:
+    from .http_client import urlopen
     from .language_constants import get_lang_code
 except ImportError:
+    from http_client import urlopen
     from language_constants import get_lang_code
 
+logger = logging.getLogger(__name__)
 
-def download_audio(text: str, language_name: str, output_path: str) -> bool:
+# Google TTS API (unofficial)
+_TTS_URL = (
+    "https://translate.google.com/translate_tts"
+    "?ie=UTF-8&client=tw-ob&tl={lang}&q={text}"
+)
+# Use a custom User-Agent to avoid 403 errors
+_TTS_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Read size used when streaming audio to disk
+_CHUNK_SIZE = 64 * 1024
+
+# Socket timeout per attempt (seconds)
+_TIMEOUT = 10
+# Rate limits and transient server errors are retried with backoff
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_MAX_RETRIES = 3
+_BACKOFF_FACTOR = 0.3
+
+
+def _open_with_retry(req: urllib.request.Request) -> Any:
+    """Open the TTS request, retrying retryable statuses with backoff."""
+    attempt = 0
+    while True:
+        try:
+            return urlopen(req, timeout=_TIMEOUT)
+        except urllib.error.HTTPError as e:
+            if e.code not in _RETRY_STATUSES or attempt >= _MAX_RETRIES:
+                raise
+            e.close()
+            time.sleep(_BACKOFF_FACTOR * 2**attempt)
+            attempt += 1
+
+
+def _looks_like_mp3(head: bytes) -> bool:
+    """Check for an ID3 tag or an MPEG frame sync at the start of the data."""
+    return head[:3] == b"ID3" or (
+        len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0
+    )
+
+
+def download_audio(
+    text: str, language_name: str, output_path: str, force: bool = False
+) -> bool:
     """
     Download TTS audio from Google Translate for the given text.
 
@@ -15,38 +69,52 @@ def download_audio(text: str, language_name: str, output_path: str) -> bool:
         text: Text to convert to speech
         language_name: Display name of the language (e.g., "English")
         output_path: Path where the audio file will be saved
+        force: Download again even if output_path already holds audio
 
     Returns:
-        True if successful, False otherwise
+        True if successful (or the file already exists), False otherwise,
+        including when the server answers with something that is not MP3
+        audio (e.g. an HTML rate-limit page)
     """
+    path = Path(output_path)
+    if not force:
+        try:
+            if path.stat().st_size > 0:
+                return True
+        except OSError:
+            pass
     lang_code = get_lang_code(language_name)
 
-    # Google TTS API (unofficial)
-    base_url = "https://translate.google.com/translate_tts"
-    params = {"ie": "UTF-8", "q": text, "tl": lang_code, "client": "tw-ob"}
-
-    url = f"{base_url}?{urllib.parse.urlencode(params)}"
+    url = _TTS_URL.format(lang=lang_code, text=urllib.parse.quote_plus(text))
+    # Written beside output_path and moved into place once complete, so an
+    # interrupted download never leaves a truncated clip that the check
+    # above would keep forever
+    tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
 
     try:
-        # Use a custom User-Agent to avoid 403 errors
-        req = urllib.request.Request(
-            url,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            },
-        )
-        with urllib.request.urlopen(req) as response:
-            data = response.read()
-
-        with open(output_path, "wb") as f:
-            f.write(data)
+        req = urllib.request.Request(url, headers=_TTS_HEADERS)
+        with _open_with_retry(req) as response:
+            head = response.read(_CHUNK_SIZE)
+            if not _looks_like_mp3(head):
+                logger.error(
+                    "TTS response for %s (%s) is not MP3 audio",
+                    language_name,
+                    lang_code,
+                )
+                return False
+            # Stream straight to disk instead of buffering the whole clip
+            with tmp_path.open("wb") as f:
+                f.write(head)
+                shutil.copyfileobj(response, f, _CHUNK_SIZE)
+        tmp_path.replace(path)
 
-        print(
-            f"LexiForge: TTS audio downloaded successfully for '{text}' in {language_name} ({lang_code})"
+        logger.debug(
+            "TTS audio downloaded for %r in %s (%s)", text, language_name, lang_code
         )
         return True
     except Exception as e:
-        print(
-            f"LexiForge: Error downloading audio for {language_name} ({lang_code}): {e}"
+        logger.error(
+            "Error downloading audio for %s (%s): %s", language_name, lang_code, e
         )
+        tmp_path.unlink(missing_ok=True)
         return False